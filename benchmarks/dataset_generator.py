@@ -0,0 +1,182 @@
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+from mongoengine import get_db
+from src.model.driver_working_day import DriverWorkingDay
+from src.model.job_models import Enterprise, Order, Route, SubEnterprise, User
+from src.model.job_watermark import JobWatermark
+
+BENCHMARK_ENTERPRISE_ID = '5e837a4a30fc256f5c3ad716'
+BENCHMARK_DB_NAME = 'driver_working_day_benchmark'
+
+# Marca gravada em toda ordem sintetica; clear() so apaga um banco cujas ordens sejam todas do benchmark
+BENCHMARK_MARKER = 'benchmark'
+
+# Collections apagadas antes de cada escala; so devem existir no banco de benchmark
+BENCHMARK_DOCUMENTS = (Enterprise, SubEnterprise, Route, User, Order, DriverWorkingDay, JobWatermark)
+
+class SyntheticDatasetGenerator:
+
+	def __init__(self, seed=1, enterprise_id=BENCHMARK_ENTERPRISE_ID, subenterprises=3, routes=20,
+			waypoints=(2, 8), missing_rate=0.08, deleted_rate=0.02, intra_day_rate=0.15, history_size=5,
+			db_name=BENCHMARK_DB_NAME):
+		self.random = random.Random(seed)
+		self.db_name = db_name
+		self.enterprise_id = ObjectId(enterprise_id)
+		self.subenterprises = subenterprises
+		self.routes = routes
+		self.waypoints = waypoints
+		self.missing_rate = missing_rate
+		self.deleted_rate = deleted_rate
+		self.intra_day_rate = intra_day_rate
+		self.history_size = history_size
+
+	def check_database(self):
+		# O nome do banco vem da conexao (a --uri pode trazer outro); nunca apagar dados que nao sejam do benchmark
+		db_name = get_db().name
+		if db_name != self.db_name:
+			raise Exception(f'refusing to touch database "{db_name}": the benchmark only runs on "{self.db_name}"')
+
+		if Order._get_collection().find_one({BENCHMARK_MARKER: {'$ne': True}}, {'_id': 1}) is not None:
+			raise Exception(f'refusing to touch database "{db_name}": its order collection holds non-benchmark data')
+
+	def clear(self):
+		self.check_database()
+		for document in BENCHMARK_DOCUMENTS:
+			document._get_collection().delete_many({})
+
+	def minutes(self, low, high):
+		return timedelta(minutes=self.random.randint(low, high), seconds=self.random.randint(0, 59))
+
+	def build_location(self):
+		return {'type': 'Point', 'coordinates': [-49.0 - self.random.random(), -16.0 - self.random.random()]}
+
+	def build_waypoints(self, first_point_at, last_point_at):
+		count = self.random.randint(*self.waypoints)
+		step = (last_point_at - first_point_at) / max(count - 1, 1)
+
+		return [
+			{
+				'point': ObjectId(),
+				'scheduled_at': first_point_at + step * i,
+				'incoming_time': (first_point_at + step * i).strftime('%H:%M'),
+				'status': self.random.choice(('pending', 'partial', 'total', 'skipped')),
+				'passengers': [{'passenger': ObjectId(), 'status': 'shipped'} for _ in range(self.random.randint(0, 6))],
+			}
+			for i in range(count)
+		]
+
+	def build_order(self, driver_id, route_id, day, start_at):
+		# Horarios previstos e realizados com atrasos aleatorios, como na operacao
+		first_point_at = start_at + self.minutes(5, 20)
+		last_point_at = first_point_at + self.minutes(20, 90)
+		end_at = last_point_at + self.minutes(5, 15)
+
+		started_improdutive_time_at = start_at + self.minutes(0, 5)
+		started_travel_at = first_point_at + self.minutes(0, 10)
+		completed_at = last_point_at + self.minutes(0, 15)
+		delivered_at = end_at + self.minutes(0, 10)
+
+		order = {
+			'_id': ObjectId(),
+			'enterprise': self.enterprise_id,
+			'driver': driver_id,
+			'route': route_id,
+			'vehicle': ObjectId(),
+			'direction': self.random.choice(('incoming', 'outcoming')),
+			'scheduled_at': day,
+			'start_time': start_at.strftime('%H:%M'),
+			'end_time': end_at.strftime('%H:%M'),
+			'start_at': start_at,
+			'end_at': end_at,
+			'started_improdutive_time_at': started_improdutive_time_at,
+			'started_travel_at': started_travel_at,
+			'completed_at': completed_at,
+			'delivered_at': delivered_at,
+			'waypoints': self.build_waypoints(first_point_at, last_point_at),
+			'start_location': self.build_location(),
+			'complete_location': self.build_location(),
+			'delivery_location': self.build_location(),
+			'edited_history': [
+				{'user': ObjectId(), 'field': 'start_time', 'edited_at': start_at - self.minutes(60, 600)}
+				for _ in range(self.random.randint(0, self.history_size))
+			],
+			'deleted': self.random.random() < self.deleted_rate,
+			'created_at': day - timedelta(days=1),
+			'updated_at': delivered_at,
+			BENCHMARK_MARKER: True,
+		}
+
+		# Ordens com marcacoes faltando (motorista nao registrou a etapa no app)
+		for field in ('started_improdutive_time_at', 'started_travel_at', 'completed_at', 'delivered_at'):
+			if self.random.random() < self.missing_rate:
+				order.pop(field)
+
+		return order, end_at
+
+	def generate(self, drivers, orders_per_driver, day=None, batch_size=5000):
+		day = day or datetime(2024, 4, 7)
+		self.check_database()
+
+		subenterprise_ids = [ObjectId() for _ in range(self.subenterprises)]
+		route_ids = [ObjectId() for _ in range(self.routes)]
+		driver_ids = [ObjectId() for _ in range(drivers)]
+
+		Enterprise._get_collection().insert_one({'_id': self.enterprise_id, 'name': 'Benchmark', 'deleted': False})
+		SubEnterprise._get_collection().insert_many([
+			{'_id': subenterprise_id, 'name': f'Sub {i}', 'enterprise': self.enterprise_id, 'deleted': False}
+			for i, subenterprise_id in enumerate(subenterprise_ids)
+		])
+		Route._get_collection().insert_many([
+			{
+				'_id': route_id,
+				'description': f'Rota {i:03d}',
+				'color': f'#{self.random.randint(0, 0xffffff):06x}',
+				'enterprise': self.enterprise_id,
+				'subenterprise': self.random.choice(subenterprise_ids),
+				'deleted': False,
+			}
+			for i, route_id in enumerate(route_ids)
+		])
+		User._get_collection().insert_many([
+			{
+				'_id': driver_id,
+				'name': f'Motorista {i}',
+				'full_name': f'Motorista Benchmark {i}',
+				'login': f'motorista{i}',
+				'profile': 'driver',
+				'enrollment': f'{i:06d}',
+				'enterprise': self.enterprise_id,
+				'deleted': False,
+			}
+			for i, driver_id in enumerate(driver_ids)
+		])
+
+		orders = []
+		orders_count = 0
+		for driver_id in driver_ids:
+			start_at = day + timedelta(hours=4) + self.minutes(0, 120)
+
+			for _ in range(orders_per_driver):
+				order, end_at = self.build_order(driver_id, self.random.choice(route_ids), day, start_at)
+				orders.append(order)
+
+				# Intervalo ate a proxima ordem: espera curta ou intrajornada (>= 1 hora)
+				start_at = end_at + (self.minutes(60, 180) if self.random.random() < self.intra_day_rate else self.minutes(2, 40))
+
+			if len(orders) >= batch_size:
+				Order._get_collection().insert_many(orders)
+				orders_count += len(orders)
+				orders = []
+
+		if orders:
+			Order._get_collection().insert_many(orders)
+			orders_count += len(orders)
+
+		return {
+			"day": day,
+			"drivers": drivers,
+			"orders": orders_count,
+			"routes": len(route_ids),
+			"subenterprises": len(subenterprise_ids),
+		}
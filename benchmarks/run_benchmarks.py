@@ -0,0 +1,232 @@
+import os, sys, io, gc, json, time, argparse, contextlib, tracemalloc
+from datetime import datetime
+
+# Executado como `python -m benchmarks.run_benchmarks` a partir da raiz do repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongoengine
+import main as job
+from benchmarks.dataset_generator import SyntheticDatasetGenerator, BENCHMARK_DB_NAME, BENCHMARK_ENTERPRISE_ID
+from src.database.CommandCounter import command_counter
+from src.database.DatabaseConnector import DatabaseConnector
+from src.model.driver_working_day import DriverWorkingDay
+from src.services.order_loader import OrderLoader
+from src.services.order_service import OrderService
+from src.services.parallel_working_day_builder import create_working_day_engine
+from src.services.working_day_summary_service import WorkingDaySummaryService
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+# Colecoes de referencia: numero de consultas deve ser constante, independente de motoristas e ordens
+REFERENCE_COLLECTIONS = ('routes', 'users', 'subenterprises', 'enterprises')
+MAX_REFERENCE_COMMANDS = 2
+
+class BenchmarkDatabaseConnector(DatabaseConnector):
+	# A conexao com o banco de benchmark ja esta aberta; main() nao deve abrir a de config.properties
+
+	def connect_database(self):
+		pass
+
+def connect_backend(backend, uri, db_name):
+	mongoengine.disconnect_all()
+
+	if backend == 'mongomock':
+		import mongomock
+		mongoengine.connect(db_name, mongo_client_class=mongomock.MongoClient)
+	else:
+		mongoengine.connect(db_name, host=uri, event_listeners=[command_counter])
+
+def parse_scales(value):
+	scales = []
+	for scale in value.split(','):
+		drivers, orders_per_driver = scale.lower().split('x')
+		scales.append((int(drivers), int(orders_per_driver)))
+	return scales
+
+def get_peak_rss_kb():
+	if resource is None:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def clear_working_days():
+	DriverWorkingDay._get_collection().delete_many({})
+
+def run_main(grouping='stream', engine='python', workers=1):
+	def run():
+		job.cph.config.read_dict({'JOB': {'job.engine': engine}})
+		job.main('2024-04-07', enterprise_id=BENCHMARK_ENTERPRISE_ID, grouping=grouping, workers=workers)
+	return run
+
+class BenchmarkSuite:
+
+	def __init__(self, backend, db_name=BENCHMARK_DB_NAME, trace_memory=True, check_queries=False, verbose=False):
+		self.backend = backend
+		self.db_name = db_name
+		self.trace_memory = trace_memory
+		self.check_queries = check_queries
+		self.verbose = verbose
+		self.order_service = OrderService()
+		self.order_loader = OrderLoader()
+		self.summary_service = WorkingDaySummaryService()
+		self.start_date = datetime(2024, 4, 7)
+		self.end_date = datetime(2024, 4, 7, 23, 59)
+		self.failures = []
+
+	@contextlib.contextmanager
+	def quiet(self):
+		if self.verbose:
+			yield
+			return
+		with contextlib.redirect_stdout(io.StringIO()):
+			yield
+
+	@contextlib.contextmanager
+	def query_guard(self, name):
+		if not self.check_queries:
+			yield
+			return
+
+		try:
+			with contextlib.ExitStack() as stack:
+				for collection in REFERENCE_COLLECTIONS:
+					stack.enter_context(command_counter.assert_max_commands(MAX_REFERENCE_COMMANDS, collection=collection))
+				yield
+		except AssertionError as e:
+			self.failures.append(f'{name}: {str(e)}')
+
+	def measure(self, name, run, setup=None, guard=False):
+		# Tempo e consultas numa execucao limpa; memoria numa segunda execucao sob tracemalloc
+		if setup:
+			setup()
+		gc.collect()
+		command_counter.reset()
+
+		with self.quiet():
+			with (self.query_guard(name) if guard else contextlib.nullcontext()):
+				started = time.perf_counter()
+				run()
+				seconds = time.perf_counter() - started
+
+		commands = command_counter.summarize()['total']
+
+		peak_memory_kb = None
+		if self.trace_memory:
+			if setup:
+				setup()
+			gc.collect()
+			tracemalloc.start()
+			try:
+				with self.quiet():
+					run()
+				peak_memory_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+			finally:
+				tracemalloc.stop()
+
+		return {
+			"benchmark": name,
+			"seconds": round(seconds, 6),
+			"peak_memory_kb": peak_memory_kb,
+			"peak_rss_kb": get_peak_rss_kb(),
+			# mongomock nao publica eventos de monitoramento
+			"commands": commands if self.backend != 'mongomock' else None,
+		}
+
+	def build_benchmarks(self):
+		service = self.order_service
+		loader = self.order_loader
+		start_date, end_date = self.start_date, self.end_date
+		enterprise_id = BENCHMARK_ENTERPRISE_ID
+
+		# Entradas compartilhadas, carregadas fora da medicao
+		orders = list(loader.stream_orders_by_driver(enterprise_id, start_date, end_date))
+		groups = list(service.iter_orders_by_driver(orders))
+		route_ids = loader.load_route_ids(enterprise_id, start_date, end_date)
+		routes = service.load_routes(route_ids)
+
+		benchmarks = [
+			("main:stream", run_main('stream'), clear_working_days, True),
+			("main:server", run_main('server'), clear_working_days, True),
+			("main:python", run_main('python'), clear_working_days, True),
+			("main:stream:rewrite-unchanged", run_main('stream'), None, True),
+			("loader:stream_orders_by_driver", lambda: list(loader.stream_orders_by_driver(enterprise_id, start_date, end_date)), None, False),
+			("loader:load_orders_grouped_by_driver", lambda: list(loader.load_orders_grouped_by_driver(enterprise_id, start_date, end_date)), None, False),
+			("service:iter_orders_by_driver", lambda: list(service.iter_orders_by_driver(orders)), None, False),
+			("service:group_orders_by_driver", lambda: service.group_orders_by_driver(orders), None, False),
+			("service:load_routes", lambda: service.load_routes(route_ids), None, False),
+			("service:resolve_routes", lambda: service.resolve_routes(orders), None, False),
+			("service:load_drivers", lambda: service.load_drivers([driver_id for _, driver_id, _, _ in groups]), None, False),
+			("service:process_working_day", lambda: [service.process_working_day(driver_orders, routes) for _, _, _, driver_orders in groups], None, False),
+			("service:build_working_days", lambda: service.build_working_days(groups, routes), None, False),
+			("summary:summarize_realized", lambda: self.summary_service.summarize_realized(enterprise_id, start_date, end_date), None, False),
+		]
+
+		engine = create_working_day_engine('numpy')
+		if not isinstance(engine, OrderService):
+			benchmarks.insert(3, ("main:stream:numpy", run_main('stream', 'numpy'), clear_working_days, True))
+			benchmarks.append(("engine:numpy:build_working_days", lambda: engine.build_working_days(groups, routes), None, False))
+
+		return benchmarks
+
+	def run_scale(self, drivers, orders_per_driver, seed):
+		generator = SyntheticDatasetGenerator(seed=seed, db_name=self.db_name)
+		generator.clear()
+		dataset = generator.generate(drivers, orders_per_driver)
+
+		records = []
+		for name, run, setup, guard in self.build_benchmarks():
+			record = self.measure(name, run, setup, guard)
+			record.update({
+				"backend": self.backend,
+				"scale": f'{drivers}x{orders_per_driver}',
+				"drivers": dataset['drivers'],
+				"orders": dataset['orders'],
+				"orders_per_second": round(dataset['orders'] / record['seconds'], 1) if record['seconds'] else None,
+			})
+			records.append(record)
+			self.print_record(record)
+
+		generator.clear()
+		return records
+
+	def print_record(self, record):
+		memory = f"{record['peak_memory_kb']:>10} KB" if record['peak_memory_kb'] is not None else f"{'-':>13}"
+		commands = f"{record['commands']:>7}" if record['commands'] is not None else f"{'-':>7}"
+		print(f"{record['scale']:>10} {record['benchmark']:<42} {record['seconds']:>10.4f} s {memory} {commands} cmds")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='End-to-end and per-method benchmarks on a synthetic dataset')
+	parser.add_argument('--backend', choices=('mongomock', 'mongod'), default='mongomock')
+	parser.add_argument('--uri', default='mongodb://localhost:27017', help='mongod URI, used with --backend mongod')
+	parser.add_argument('--db-name', default=BENCHMARK_DB_NAME, help='database emptied and refilled by the benchmark; must match the database in --uri and hold only benchmark orders')
+	parser.add_argument('--scales', type=parse_scales, default=parse_scales('10x10,100x20,500x20'), help='comma separated DRIVERSxORDERS_PER_DRIVER')
+	parser.add_argument('--seed', type=int, default=1)
+	parser.add_argument('--output', help='append the results as JSON lines to this file')
+	parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+	parser.add_argument('--check-queries', action='store_true', help=f'fail when a main() run issues more than {MAX_REFERENCE_COMMANDS} commands on a reference collection (mongod only)')
+	parser.add_argument('--verbose', action='store_true', help='show the output of the benchmarked code')
+	args = parser.parse_args()
+
+	connect_backend(args.backend, args.uri, args.db_name)
+	job.db_connector = BenchmarkDatabaseConnector()
+
+	suite = BenchmarkSuite(args.backend, args.db_name, not args.no_memory, args.check_queries and args.backend == 'mongod', args.verbose)
+
+	# Falha antes de qualquer escrita se a conexao apontar para outro banco
+	SyntheticDatasetGenerator(db_name=args.db_name).check_database()
+
+	print(f"{'scale':>10} {'benchmark':<42} {'time':>12} {'peak memory':>13} {'queries':>12}")
+	records = []
+	for drivers, orders_per_driver in args.scales:
+		records.extend(suite.run_scale(drivers, orders_per_driver, args.seed))
+
+	if args.output:
+		with open(args.output, 'a') as output_file:
+			for record in records:
+				output_file.write(json.dumps(record, sort_keys=True) + '\n')
+
+	for failure in suite.failures:
+		print(f'Query check failed: {failure}')
+	sys.exit(1 if suite.failures else 0)
@@ -1,22 +1,132 @@
-import sys
+import sys, argparse
 from dateutil.parser import parse
 from datetime import datetime, timedelta
+from itertools import islice
 from src.services.order_service import OrderService
+from src.services.order_loader import OrderLoader
+from src.services.working_day_writer import DriverWorkingDayWriter
+from src.services.watermark_service import WatermarkService
+from src.services.recompute_daemon import RecomputeDaemon
+from src.services.parallel_working_day_builder import ParallelWorkingDayBuilder, create_working_day_engine
+from src.services.run_report import RunReport
+from src.services.run_profiler import RunProfiler
 from src.database.DatabaseConnector import DatabaseConnector
-from src.model.order import Order
-from mongoengine import Q
-from bson import DBRef, ObjectId
+from src.database.IndexManager import IndexManager, ORDER_DRIVER_SORT, ORDER_DRIVER_DAY_SORT
+from src.database.CommandCounter import command_counter
+from src.utils import ConfigPropertiesHelper
 
 now_date = datetime.now()
 db_connector = DatabaseConnector()
 order_service = OrderService()
+order_loader = OrderLoader()
+index_manager = IndexManager()
+watermark_service = WatermarkService()
+cph = ConfigPropertiesHelper()
+run_profiler = RunProfiler()
+
+def resolve_enterprises(enterprise_id, enterprise_ids=None, all_enterprises=False):
+	# Varias empresas sao lidas numa unica consulta particionada por empresa
+	if all_enterprises:
+		return None
+	if enterprise_ids:
+		return list(enterprise_ids)
+	return enterprise_id
+
+def prepare_query(enterprises, start_date, end_date, by_day=False):
+	if cph.get_property_value('JOB', 'job.ensure_indexes', 'false') == 'true':
+		index_manager.ensure_indexes()
+
+	# O plano verificado e o da ordenacao que a execucao vai usar
+	index_manager.verify_query_plan(
+		order_loader.build_day_match(enterprises, start_date, end_date),
+		cph.get_property_value('JOB', 'job.query_plan_check', 'warn'),
+		ORDER_DRIVER_DAY_SORT if by_day else ORDER_DRIVER_SORT
+	)
+
+def start_report(run):
+	# Os round-trips ao MongoDB passam a ser contados na etapa ativa deste relatorio
+	report = RunReport(run)
+	command_counter.reset(report.current_stage)
+	if run_profiler.trace_memory:
+		report.stage_hooks.append(run_profiler.on_stage_end)
+	return report
+
+def emit_report(report):
+	report.commands = command_counter.summarize()
+	report.memory = run_profiler.memory_summary()
+	report.emit(
+		cph.get_property_value('JOB', 'job.report_path', ''),
+		cph.get_property_value('JOB', 'job.prometheus_textfile', '')
+	)
+
+def count_groups(orders_grouped, report):
+	for group in orders_grouped:
+		report.count('driver_days')
+		report.count('orders', len(group[3]))
+		yield group
+
+def iter_batches(orders_grouped, batch_size):
+	# Lotes de motoristas para o motor de calculo; a memoria continua limitada ao lote
+	orders_grouped = iter(orders_grouped)
+	while True:
+		groups = list(islice(orders_grouped, batch_size))
+		if not groups:
+			break
+		yield groups
+
+def write_working_days(orders_grouped, routes, workers=1, report=None, track_driver_days=False):
+	report = report or RunReport('adhoc')
+	orders_grouped = count_groups(orders_grouped, report)
+	writer = DriverWorkingDayWriter(int(cph.get_property_value('JOB', 'job.write_chunk_size', '500')))
+	engine_name = cph.get_property_value('JOB', 'job.engine', 'python')
+	batches = iter_batches(orders_grouped, int(cph.get_property_value('JOB', 'job.engine_batch_drivers', '256')))
+	processed_enterprises = set()
+	# So o recalculo precisa das chaves gravadas; no diario e no backfill a memoria fica limitada ao lote
+	processed_driver_days = set() if track_driver_days else None
+
+	if workers > 1:
+		print(f"computing working days on {workers} workers...")
+		results = ParallelWorkingDayBuilder(workers, routes, engine_name).build(batches)
+	else:
+		engine = create_working_day_engine(engine_name)
+		results = (engine.build_working_days(groups, routes) for groups in batches)
+
+	# O calculo (local ou no pool) consome o cursor; leitura e agrupamento sao descontados do tempo de compute
+	for working_days in report.track('compute', results):
+		with report.stage('save'):
+			for working_day in working_days:
+				writer.add(working_day)
+				processed_enterprises.add(str(working_day['enterprise']))
+				if track_driver_days:
+					processed_driver_days.add((working_day['enterprise'], working_day['driver'], working_day['scheduled_at']))
+
+		report.count('working_days', len(working_days))
+
+		# Libera o lote antes de ler os proximos motoristas do cursor
+		del working_days
+
+	try:
+		with report.stage('save'):
+			written = writer.close()
+	finally:
+		report.count('working_days_written', writer.written)
+		report.count('working_days_unchanged', writer.skipped)
+		report.count('working_days_failed', writer.failed)
+		report.count('write_chunks', writer.chunks)
+
+	report.count('enterprises', len(processed_enterprises))
+	print(f"{written} working days written, {writer.skipped} unchanged, {len(processed_enterprises)} enterprises")
+
+	return processed_driver_days
+
+def main(scheduled_at=None, enterprise_id="5e837a4a30fc256f5c3ad716", grouping="stream", enterprise_ids=None, all_enterprises=False, workers=1):
+	report = start_report('daily')
 
-def main(scheduled_at=None, enterprise_id="5e837a4a30fc256f5c3ad716"):
-	
 	try:
 		print("Run application...")
 
-		db_connector.connect_database()
+		with report.stage('connect'):
+			db_connector.connect_database()
 
 		if scheduled_at is None:
 			scheduled_at = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
@@ -24,43 +134,246 @@ def main(scheduled_at=None, enterprise_id="5e837a4a30fc256f5c3ad716"):
 		yesterday_start_date =	parse(scheduled_at + " 00:00")
 		yesterday_end_date 	 = 	parse(scheduled_at + " 23:59")
 
-		orders = Order.objects(
-			deleted=False,
-			enterprise=DBRef('enterprises', ObjectId(enterprise_id)),
-		).filter(
-			Q(scheduled_at__gte=yesterday_start_date) &
-			Q(scheduled_at__lte=yesterday_end_date)
-		)
-	
-		print("grouping OS by drivers...")
-		orders_grouped = order_service.group_orders_by_driver(orders)
-
-		for driver_id, driver_orders in orders_grouped.items():
-      
-			driver_orders_sorted = sorted(driver_orders, key=lambda x: x.start_time)
-   
-			working_day_realized = order_service.process_working_day_realized(driver_orders_sorted)
-   
-			working_day_foreseen = order_service.process_working_day_foreseen(driver_orders_sorted)
-   
-			driver = {
-				"driver": driver_id,
-				"scheduled_at": scheduled_at,
-				"enterprise": enterprise_id,
-				"accomplished": {
-					"summary": working_day_realized['summary'],
-					"details": working_day_realized['details']
-				},
-				"foreseen": {
-					"summary": working_day_foreseen['summary'],
-					"details": working_day_foreseen['details']
-				}
-			}
-			order_service.save_working_day(driver)
+		enterprises = resolve_enterprises(enterprise_id, enterprise_ids, all_enterprises)
+
+		if enterprises != enterprise_id and grouping != 'stream':
+			raise ValueError('multi-enterprise runs require grouping="stream"')
+
+		with report.stage('query'):
+			prepare_query(enterprises, yesterday_start_date, yesterday_end_date)
+
+		if grouping == 'stream':
+			print("resolving routes...")
+			with report.stage('routes'):
+				routes = order_service.load_routes(
+					order_loader.load_route_ids(enterprises, yesterday_start_date, yesterday_end_date)
+				)
+
+			print("streaming OS by drivers...")
+			orders = report.track('fetch', order_loader.stream_orders_by_driver(
+				enterprises, yesterday_start_date, yesterday_end_date,
+				batch_size=int(cph.get_property_value('JOB', 'job.batch_size', '1000'))
+			))
+			orders_grouped = report.track('group', (
+				(group_enterprise_id, driver_id, scheduled_at, driver_orders)
+				for group_enterprise_id, driver_id, _, driver_orders in order_service.iter_orders_by_driver(orders)
+			))
+		elif grouping == 'server':
+			print("resolving routes...")
+			with report.stage('routes'):
+				routes = order_service.load_routes(
+					order_loader.load_route_ids(enterprise_id, yesterday_start_date, yesterday_end_date)
+				)
+
+			# Agrupamento feito no servidor: o tempo do $group aparece dentro do fetch
+			print("grouping OS by drivers on server...")
+			orders_grouped = report.track('fetch', (
+				(enterprise_id, driver_id, scheduled_at, driver_orders)
+				for driver_id, driver_orders in order_loader.load_orders_grouped_by_driver(enterprise_id, yesterday_start_date, yesterday_end_date)
+			))
+		else:
+			orders = report.track('fetch', order_loader.load_orders(enterprise_id, yesterday_start_date, yesterday_end_date))
+
+			print("grouping OS by drivers...")
+			with report.stage('group'):
+				orders_by_driver = order_service.group_orders_by_driver(orders)
+
+			print("resolving routes...")
+			with report.stage('routes'):
+				routes = order_service.resolve_routes(
+					order for driver_orders in orders_by_driver.values() for order in driver_orders
+				)
+
+			orders_grouped = report.track('sort', (
+				(enterprise_id, driver_id, scheduled_at, sorted(driver_orders, key=lambda x: x.start_time))
+				for driver_id, driver_orders in orders_by_driver.items()
+			))
 
+		write_working_days(orders_grouped, routes, workers, report)
+
+		report.status = 'success'
 		print("Finish application...")
 	except Exception as e:
 		print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
 		raise 
+	finally:
+		emit_report(report)
+
+def backfill(start_date, end_date, enterprise_id="5e837a4a30fc256f5c3ad716", enterprise_ids=None, all_enterprises=False, workers=1):
+
+	report = start_report('backfill')
+
+	try:
+		print("Run backfill...")
+
+		with report.stage('connect'):
+			db_connector.connect_database()
+
+		backfill_start_date = parse(start_date + " 00:00")
+		backfill_end_date 	= parse(end_date + " 23:59")
+
+		enterprises = resolve_enterprises(enterprise_id, enterprise_ids, all_enterprises)
+
+		with report.stage('query'):
+			prepare_query(enterprises, backfill_start_date, backfill_end_date, by_day=True)
 
-main("2024-04-07T00:00:00.000Z")
\ No newline at end of file
+		print("resolving routes...")
+		with report.stage('routes'):
+			routes = order_service.load_routes(
+				order_loader.load_route_ids(enterprises, backfill_start_date, backfill_end_date)
+			)
+
+		# Uma unica varredura do intervalo, agrupada por (empresa, motorista, dia)
+		print("streaming OS by drivers and days...")
+		orders = report.track('fetch', order_loader.stream_orders_by_driver(
+			enterprises, backfill_start_date, backfill_end_date,
+			batch_size=int(cph.get_property_value('JOB', 'job.batch_size', '1000')),
+			by_day=True
+		))
+
+		write_working_days(report.track('group', order_service.iter_orders_by_driver(orders, by_day=True)), routes, workers, report)
+
+		report.status = 'success'
+		print("Finish backfill...")
+	except Exception as e:
+		print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+		raise
+	finally:
+		emit_report(report)
+
+def recompute_driver_days(driver_days, workers=1, report=None):
+	if report is None:
+		# Chamado pelo daemon: cada recalculo gera o seu proprio relatorio
+		report = start_report('recompute')
+		try:
+			recompute_driver_days(driver_days, workers, report)
+			report.status = 'success'
+		finally:
+			emit_report(report)
+		return
+
+	with report.stage('fetch'):
+		orders = order_loader.load_driver_day_orders(driver_days)
+	with report.stage('routes'):
+		routes = order_service.resolve_routes(orders)
+
+	processed_driver_days = write_working_days(
+		report.track('group', order_service.iter_orders_by_driver(orders, by_day=True)), routes, workers, report,
+		track_driver_days=True
+	)
+
+	# Motorista-dia sem nenhuma ordem valida restante (ex.: todas excluidas)
+	stale_driver_days = [
+		(driver_id, enterprise_id, scheduled_at)
+		for enterprise_id, driver_id, scheduled_at in driver_days
+		if (enterprise_id, driver_id, scheduled_at) not in processed_driver_days
+	]
+	if stale_driver_days:
+		with report.stage('save'):
+			deleted = DriverWorkingDayWriter().delete(stale_driver_days)
+		report.count('working_days_removed', deleted)
+		print(f"{deleted} stale working days removed")
+
+def incremental(enterprise_id="5e837a4a30fc256f5c3ad716", enterprise_ids=None, all_enterprises=False, workers=1):
+
+	report = start_report('incremental')
+
+	try:
+		print("Run incremental...")
+
+		with report.stage('connect'):
+			db_connector.connect_database()
+
+		enterprises = resolve_enterprises(enterprise_id, enterprise_ids, all_enterprises)
+		watermark_name = watermark_service.build_name(enterprises)
+
+		# Sobreposicao com a execucao anterior: escritas em andamento gravam updated_at antes de ficarem visiveis
+		since = watermark_service.load_watermark(
+			watermark_name,
+			int(cph.get_property_value('JOB', 'job.incremental_lookback_hours', '24'))
+		) - timedelta(seconds=int(cph.get_property_value('JOB', 'job.incremental_safety_lag_seconds', '120')))
+		until = datetime.now()
+
+		print(f"loading OS updated since {since}...")
+		with report.stage('query'):
+			driver_days = order_loader.load_updated_driver_days(enterprises, since, until)
+		report.count('driver_days_affected', len(driver_days))
+		print(f"{len(driver_days)} driver days affected")
+
+		if driver_days:
+			recompute_driver_days(driver_days, workers, report)
+
+		watermark_service.save_watermark(watermark_name, until)
+
+		report.status = 'success'
+		print("Finish incremental...")
+	except Exception as e:
+		print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+		raise
+	finally:
+		emit_report(report)
+
+def daemon(enterprise_id="5e837a4a30fc256f5c3ad716", enterprise_ids=None, all_enterprises=False):
+
+	try:
+		print("Run daemon...")
+
+		db_connector.connect_database()
+
+		recompute_daemon = RecomputeDaemon(
+			recompute_driver_days,
+			resolve_enterprises(enterprise_id, enterprise_ids, all_enterprises),
+			debounce_seconds=int(cph.get_property_value('JOB', 'job.daemon_debounce_seconds', '30')),
+			max_delay_seconds=int(cph.get_property_value('JOB', 'job.daemon_max_delay_seconds', '300')),
+			poll_seconds=int(cph.get_property_value('JOB', 'job.daemon_poll_seconds', '60')),
+			safety_lag_seconds=int(cph.get_property_value('JOB', 'job.incremental_safety_lag_seconds', '120'))
+		)
+		recompute_daemon.run()
+
+		print("Finish daemon...")
+	except Exception as e:
+		print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+		raise
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--date', help='scheduled_at day (YYYY-MM-DD), defaults to yesterday')
+	parser.add_argument('--start-date', help='first day of a backfill (YYYY-MM-DD)')
+	parser.add_argument('--end-date', help='last day of a backfill (YYYY-MM-DD), defaults to --start-date')
+	parser.add_argument('--incremental', action='store_true', help='recompute only driver days whose orders changed since the last run')
+	parser.add_argument('--daemon', action='store_true', help='keep recomputing driver days as their orders change')
+	parser.add_argument('--enterprise', action='append', dest='enterprise_ids', help='enterprise id, may be repeated')
+	parser.add_argument('--all-enterprises', action='store_true')
+	parser.add_argument('--workers', type=int, default=1, help='processes used to compute the working days')
+	parser.add_argument('--grouping', choices=('stream', 'server', 'python'), default='stream')
+	parser.add_argument('--profile', nargs='?', const='main.pstats', metavar='PATH', help='profile the run with cProfile, writing pstats to PATH (default main.pstats)')
+	parser.add_argument('--profile-top', type=int, default=25, help='entries shown in the profile and memory summaries')
+	parser.add_argument('--trace-memory', action='store_true', help='trace allocations with tracemalloc at each stage boundary and report peak RSS')
+	args = parser.parse_args()
+
+	run_profiler = RunProfiler(args.profile, args.trace_memory, args.profile_top)
+	run_profiler.start()
+
+	try:
+		if args.daemon:
+			daemon(enterprise_ids=args.enterprise_ids, all_enterprises=args.all_enterprises)
+		elif args.incremental:
+			incremental(enterprise_ids=args.enterprise_ids, all_enterprises=args.all_enterprises, workers=args.workers)
+		elif args.start_date:
+			backfill(
+				args.start_date,
+				args.end_date or args.start_date,
+				enterprise_ids=args.enterprise_ids,
+				all_enterprises=args.all_enterprises,
+				workers=args.workers
+			)
+		else:
+			main(
+				args.date,
+				grouping=args.grouping,
+				enterprise_ids=args.enterprise_ids,
+				all_enterprises=args.all_enterprises,
+				workers=args.workers
+			)
+	finally:
+		run_profiler.stop()
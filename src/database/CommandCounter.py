@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from pymongo import monitoring
+
+def get_command_collection(event):
+    # getMore guarda a collection em 'collection'; nos demais comandos ela e o valor do proprio comando
+    if event.command_name == 'getMore':
+        return event.command.get('collection')
+
+    value = event.command.get(event.command_name)
+    return value if isinstance(value, str) else None
+
+def count_matching(counts, command=None, collection=None, stage=None):
+    return sum(
+        count for (count_stage, count_command, count_collection), count in counts.items()
+        if (command is None or count_command == command)
+        and (collection is None or count_collection == collection)
+        and (stage is None or count_stage == stage)
+    )
+
+class CommandCounter(monitoring.CommandListener):
+    # Conta os round-trips ao MongoDB por etapa, comando e collection
+
+    def __init__(self):
+        self.counts = {}
+        self.failed_commands = 0
+        self.stage_provider = None
+
+    def reset(self, stage_provider=None):
+        self.counts = {}
+        self.failed_commands = 0
+        self.stage_provider = stage_provider
+
+    def started(self, event):
+        stage = self.stage_provider() if self.stage_provider else None
+        key = (stage or 'other', event.command_name, get_command_collection(event))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        self.failed_commands += 1
+
+    def total(self, command=None, collection=None, stage=None):
+        return count_matching(self.counts, command, collection, stage)
+
+    def summarize(self):
+        by_command = {}
+        by_stage = {}
+        for (stage, command, collection), count in self.counts.items():
+            name = f'{command}:{collection}' if collection else command
+            by_command[name] = by_command.get(name, 0) + count
+            by_stage.setdefault(stage, {})
+            by_stage[stage][name] = by_stage[stage].get(name, 0) + count
+
+        return {
+            "total": sum(self.counts.values()),
+            "failed": self.failed_commands,
+            "by_command": by_command,
+            "by_stage": by_stage,
+        }
+
+    @contextmanager
+    def assert_max_commands(self, limit, command=None, collection=None, stage=None):
+        # Guarda contra N+1: falha se o bloco fizer mais round-trips do que o limite
+        before = dict(self.counts)
+        yield self
+
+        issued = {key: count - before.get(key, 0) for key, count in self.counts.items() if count != before.get(key, 0)}
+        used = count_matching(issued, command, collection, stage)
+        if used > limit:
+            details = ', '.join(f'{key[1]}:{key[2]}@{key[0]}={count}' for key, count in sorted(issued.items(), key=str))
+            raise AssertionError(f'{used} MongoDB commands issued, expected at most {limit} ({details})')
+
+# Instancia unica registrada no MongoClient pelo DatabaseConnector
+command_counter = CommandCounter()
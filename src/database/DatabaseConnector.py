@@ -1,19 +1,61 @@
 from mongoengine import connect
+from pymongo import ReadPreference, WriteConcern
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from src.database.CommandCounter import command_counter
 from src.utils import ConfigPropertiesHelper
 
 class DatabaseConnector:
+    # Preferencia de leitura da fase de leitura em lote e write concern da gravacao dos resultados
+    read_preference = ReadPreference.PRIMARY
+    write_concern = None
+
     def __init__(self):
         self.cph = ConfigPropertiesHelper()
 
+    def build_client_options(self):
+        # Opcoes repassadas ao MongoClient; compressores sem o modulo instalado sao ignorados pelo pymongo
+        options = {
+            'maxPoolSize': int(self.cph.get_property_value('MONGODB', 'mongodb.max_pool_size', '100')),
+            'minPoolSize': int(self.cph.get_property_value('MONGODB', 'mongodb.min_pool_size', '0')),
+            'serverSelectionTimeoutMS': int(self.cph.get_property_value('MONGODB', 'mongodb.server_selection_timeout_ms', '30000')),
+            'connectTimeoutMS': int(self.cph.get_property_value('MONGODB', 'mongodb.connect_timeout_ms', '20000')),
+            'appname': self.cph.get_property_value('MONGODB', 'mongodb.appname', 'process-journey-driver-service'),
+            'event_listeners': [command_counter],
+        }
+
+        socket_timeout = int(self.cph.get_property_value('MONGODB', 'mongodb.socket_timeout_ms', '0'))
+        if socket_timeout:
+            options['socketTimeoutMS'] = socket_timeout
+
+        compressors = self.cph.get_property_value('MONGODB', 'mongodb.compressors', '').strip()
+        if compressors:
+            options['compressors'] = compressors
+            options['zlibCompressionLevel'] = int(self.cph.get_property_value('MONGODB', 'mongodb.zlib_compression_level', '-1'))
+
+        return options
+
+    def build_read_preference(self):
+        name = self.cph.get_property_value('MONGODB', 'mongodb.read_preference', 'primary')
+        return make_read_preference(read_pref_mode_from_name(name), None)
+
+    def build_write_concern(self):
+        w = self.cph.get_property_value('MONGODB', 'mongodb.write_concern', 'majority')
+        wtimeout = int(self.cph.get_property_value('MONGODB', 'mongodb.write_concern_timeout_ms', '0'))
+        return WriteConcern(w=int(w) if w.isdigit() else w, wtimeout=wtimeout or None)
+
     def connect_database(self):
         MONGODB_ENVIRONMENT = self.cph.get_property_value('MONGODB', 'mongodb.environment')
         MONGODB_HOST 		= self.cph.get_property_value('MONGODB', f'mongodb.host.{MONGODB_ENVIRONMENT}')
         MONGODB_USER 		= self.cph.get_property_value('MONGODB', 'mongodb.user')
         MONGODB_PASS 		= self.cph.get_property_value('MONGODB', 'mongodb.pass')
         MONGODB_NAME 		= self.cph.get_property_value('MONGODB', f'mongodb.name.{MONGODB_ENVIRONMENT}')
-        
+
+        DatabaseConnector.read_preference = self.build_read_preference()
+        DatabaseConnector.write_concern = self.build_write_concern()
+        options = self.build_client_options()
+
         if MONGODB_HOST == 'localhost':
-            connect(MONGODB_NAME)
+            connect(MONGODB_NAME, **options)
         else:
             dbqs = 'mongodb+srv://{db_user}:{db_pass}@{db_host}/{db_name}?retryWrites=true&w=majority'.format(
                 db_host=MONGODB_HOST,
@@ -22,4 +64,22 @@ class DatabaseConnector:
                 db_name=MONGODB_NAME
             )
 
-            connect(host=dbqs)
+            connect(host=dbqs, **options)
+
+    @classmethod
+    def get_read_collection(cls, document):
+        # Leituras em lote das ordens, rotas e motoristas; podem ir para um secundario
+        return document._get_collection().with_options(read_preference=cls.read_preference)
+
+    @classmethod
+    def get_primary_collection(cls, document):
+        # Leituras que nao podem ver dados atrasados de replicacao (deteccao de mudancas da marca d'agua)
+        return document._get_collection().with_options(read_preference=ReadPreference.PRIMARY)
+
+    @classmethod
+    def get_write_collection(cls, document):
+        # Gravacao dos resultados sempre no primario, com o write concern proprio
+        return document._get_collection().with_options(
+            read_preference=ReadPreference.PRIMARY,
+            write_concern=cls.write_concern
+        )
@@ -0,0 +1,64 @@
+from pymongo import ASCENDING, IndexModel
+from src.model.driver_working_day import DriverWorkingDay
+from src.model.job_models import Order
+
+# Igualdade (enterprise, deleted), ordenacao (driver, start_time) e intervalo (scheduled_at)
+ORDER_INDEXES = [
+    IndexModel(
+        [('enterprise', ASCENDING), ('deleted', ASCENDING), ('driver', ASCENDING), ('start_time', ASCENDING), ('scheduled_at', ASCENDING)],
+        name='enterprise_deleted_driver_start_time_scheduled_at'
+    ),
+    # Backfill e recalculo incremental: ordenacao por (driver, scheduled_at); o start_time e ordenado por grupo no cliente
+    IndexModel(
+        [('enterprise', ASCENDING), ('deleted', ASCENDING), ('driver', ASCENDING), ('scheduled_at', ASCENDING)],
+        name='enterprise_deleted_driver_scheduled_at'
+    ),
+    # Execucao incremental: ordens alteradas ou criadas depois da marca d'agua
+    IndexModel([('updated_at', ASCENDING)], name='updated_at'),
+    IndexModel([('created_at', ASCENDING)], name='created_at'),
+]
+
+ORDER_DRIVER_SORT = [('enterprise', ASCENDING), ('driver', ASCENDING), ('start_time', ASCENDING)]
+ORDER_DRIVER_DAY_SORT = [('enterprise', ASCENDING), ('driver', ASCENDING), ('scheduled_at', ASCENDING)]
+
+class IndexManager:
+
+    def ensure_indexes(self):
+        print("ensuring indexes...")
+        Order._get_collection().create_indexes(ORDER_INDEXES)
+        DriverWorkingDay.ensure_indexes()
+
+    def find_plan_stages(self, plan):
+        stages = []
+        if isinstance(plan, dict):
+            if 'stage' in plan:
+                stages.append(plan['stage'])
+            for value in plan.values():
+                stages.extend(self.find_plan_stages(value))
+        elif isinstance(plan, list):
+            for value in plan:
+                stages.extend(self.find_plan_stages(value))
+        return stages
+
+    def verify_query_plan(self, match, mode='warn', sort=ORDER_DRIVER_SORT):
+        if mode == 'off':
+            return None
+
+        try:
+            explain = Order._get_collection().find(match).sort(sort).explain()
+        except (AttributeError, NotImplementedError) as e:
+            # mongomock nao implementa explain()
+            print(f'Query plan check unavailable: {str(e)}')
+            return None
+
+        stages = self.find_plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+
+        # COLLSCAN: nenhum indice no filtro; SORT: ordenacao bloqueante em memoria (ou em disco) no servidor
+        problems = [stage for stage in ('COLLSCAN', 'SORT') if stage in stages]
+        if problems:
+            message = f'Order day query falls back to {" and ".join(problems)} (plan stages: {", ".join(stages)})'
+            if mode == 'fail':
+                raise Exception(message)
+            print(f'WARNING: {message}')
+
+        return stages
@@ -44,12 +44,22 @@ class Foreseen(EmbeddedDocument):
 
 class DriverWorkingDay(Document):
     
-    meta = {'collection': 'driver_working_days'}
+    meta = {
+        'collection': 'driver_working_days',
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['driver', 'enterprise', 'scheduled_at'], 'unique': True},
+            ('enterprise', 'scheduled_at'),
+            # Execucao incremental: motorista-dia antigo de uma ordem reatribuida ou reagendada
+            'accomplished.details.id',
+        ]
+    }
     
     driver                  = ObjectIdField(required=True)
     enterprise              = ObjectIdField()
     scheduled_at            = DateTimeField()
     accomplished            = EmbeddedDocumentField(Accomplished)
     foreseen                = EmbeddedDocumentField(Foreseen)
+    content_hash            = StringField()
     created_at              = DateTimeField(default=datetime.datetime.now)
     updated_at 		        = DateTimeField(null=True)
\ No newline at end of file
@@ -0,0 +1,11 @@
+import datetime
+from mongoengine import Document
+from mongoengine.fields import DateTimeField, StringField
+
+class JobWatermark(Document):
+
+    meta = {'collection': 'job_watermarks'}
+
+    name                    = StringField(primary_key=True)
+    updated_at              = DateTimeField()
+    run_at                  = DateTimeField(default=datetime.datetime.now)
@@ -0,0 +1,94 @@
+from bson import DBRef
+from mongoengine import Document
+
+# Campos do Order lidos pelo calculo da jornada do motorista
+ORDER_TIMING_FIELDS = (
+    'enterprise',
+    'driver',
+    'route',
+    'direction',
+    'scheduled_at',
+    'start_time',
+    'start_at',
+    'end_at',
+    'started_improdutive_time_at',
+    'started_travel_at',
+    'completed_at',
+    'delivered_at',
+)
+
+# Do waypoints so interessam os horarios do primeiro e do ultimo ponto
+ORDER_TIMING_SLOTS = ('id',) + ORDER_TIMING_FIELDS + ('first_point_at', 'last_point_at', 'has_waypoints')
+
+def get_reference_id(value):
+    if isinstance(value, (DBRef, Document)):
+        return value.id
+    return value
+
+class OrderTiming:
+    # Registro imutavel e compacto: sem __dict__, referencias guardadas apenas como ObjectId
+    __slots__ = ORDER_TIMING_SLOTS
+
+    def __init__(self, *values):
+        for slot, value in zip(ORDER_TIMING_SLOTS, values):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        # Pickle enxuto para os workers paralelos: apenas a tupla de valores
+        return (type(self), tuple(getattr(self, slot) for slot in ORDER_TIMING_SLOTS))
+
+    def __getitem__(self, name):
+        # Compatibilidade com o acesso order['campo'] usado nos documentos do mongoengine
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __eq__(self, other):
+        if not isinstance(other, OrderTiming):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in ORDER_TIMING_SLOTS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'OrderTiming(id={self.id!r}, driver={self.driver!r}, start_time={self.start_time!r})'
+
+    @property
+    def waypoints(self):
+        if not self.has_waypoints:
+            return ()
+        return ({'scheduled_at': self.first_point_at}, {'scheduled_at': self.last_point_at})
+
+    @classmethod
+    def from_raw(cls, raw):
+        # Documento cru do OrderLoader.build_projection
+        has_waypoints = bool(raw.get('waypoints_count'))
+
+        return cls(
+            raw['_id'],
+            *[get_reference_id(raw.get(field)) for field in ORDER_TIMING_FIELDS],
+            raw.get('first_point_scheduled_at') if has_waypoints else None,
+            raw.get('last_point_scheduled_at') if has_waypoints else None,
+            has_waypoints,
+        )
+
+    @classmethod
+    def from_document(cls, order):
+        # Le o _data do mongoengine, sem desreferenciar enterprise, driver e route
+        data = order._data
+        waypoints = data.get('waypoints') or []
+
+        return cls(
+            order.id,
+            *[get_reference_id(data.get(field)) for field in ORDER_TIMING_FIELDS],
+            waypoints[0]['scheduled_at'] if waypoints else None,
+            waypoints[-1]['scheduled_at'] if waypoints else None,
+            bool(waypoints),
+        )
@@ -0,0 +1,222 @@
+import sys
+from datetime import timedelta
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from src.database.DatabaseConnector import DatabaseConnector
+from src.database.IndexManager import ORDER_DRIVER_SORT, ORDER_DRIVER_DAY_SORT
+from src.model.driver_working_day import DriverWorkingDay
+from src.model.job_models import Order
+from src.model.order_timing import OrderTiming, ORDER_TIMING_FIELDS
+from src.utils import DateTimeUtils
+
+class OrderLoader:
+
+	def __init__(self, raw_bson=True):
+		self.raw_bson = raw_bson
+		self.date_utils = DateTimeUtils()
+
+	def get_order_collection(self, primary=False):
+		# primary=True para leituras que decidem o que recalcular: um secundario atrasado perderia alteracoes
+		collection = DatabaseConnector.get_primary_collection(Order) if primary else DatabaseConnector.get_read_collection(Order)
+		if not self.raw_bson:
+			return collection
+
+		# Lotes do cursor ficam em bytes (RawBSONDocument); cada ordem so e decodificada quando o OrderTiming a le.
+		# As referencias do Order sao gravadas como ObjectId (sem dbref=True) e chegam decodificadas
+		try:
+			return collection.with_options(
+				codec_options=collection.codec_options.with_options(document_class=RawBSONDocument)
+			)
+		except NotImplementedError:
+			# mongomock nao suporta document_class customizado
+			return collection
+
+	def build_enterprise_filter(self, match, enterprise_id):
+		# Uma empresa, uma lista de empresas ou None para todas
+		if isinstance(enterprise_id, (list, tuple, set)):
+			match['enterprise'] = {'$in': [ObjectId(enterprise) for enterprise in enterprise_id]}
+		elif enterprise_id is not None:
+			match['enterprise'] = ObjectId(enterprise_id)
+
+		return match
+
+	def build_day_match(self, enterprise_id, start_date, end_date):
+		# Ordens ainda sem motorista nao formam jornada
+		match = {
+			'deleted': False,
+			'driver': {'$ne': None},
+			'scheduled_at': {'$gte': start_date, '$lte': end_date},
+		}
+		return self.build_enterprise_filter(match, enterprise_id)
+
+	def build_driver_days_match(self, driver_days):
+		# O motorista-dia cobre o dia inteiro, inclusive ordens com horario no scheduled_at
+		return {
+			'deleted': False,
+			'$or': [
+				{
+					'enterprise': enterprise_id,
+					'driver': driver_id,
+					'scheduled_at': {'$gte': scheduled_at, '$lt': scheduled_at + timedelta(days=1)} if scheduled_at is not None else None,
+				}
+				for enterprise_id, driver_id, scheduled_at in driver_days
+			],
+		}
+
+	def build_day_expression(self, field):
+		# Data a 00:00 no servidor ($dateTrunc so existe a partir do MongoDB 5.0)
+		return {
+			'$cond': [
+				{'$ifNull': [field, False]},
+				{'$dateFromParts': {'year': {'$year': field}, 'month': {'$month': field}, 'day': {'$dayOfMonth': field}}},
+				None
+			]
+		}
+
+	def build_projection(self):
+		projection = {field: 1 for field in ORDER_TIMING_FIELDS}
+
+		# Equivalente a um $slice do primeiro e do ultimo waypoint, trazendo apenas o scheduled_at
+		projection['first_point_scheduled_at'] = {
+			'$let': {'vars': {'point': {'$arrayElemAt': ['$waypoints', 0]}}, 'in': '$$point.scheduled_at'}
+		}
+		projection['last_point_scheduled_at'] = {
+			'$let': {'vars': {'point': {'$arrayElemAt': ['$waypoints', -1]}}, 'in': '$$point.scheduled_at'}
+		}
+		projection['waypoints_count'] = {'$size': {'$ifNull': ['$waypoints', []]}}
+
+		return projection
+
+	def load_orders(self, enterprise_id, start_date, end_date):
+		try:
+			pipeline = [
+				{'$match': self.build_day_match(enterprise_id, start_date, end_date)},
+				{'$project': self.build_projection()},
+			]
+
+			for raw in self.get_order_collection().aggregate(pipeline):
+				yield OrderTiming.from_raw(raw)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def stream_orders_by_driver(self, enterprise_id, start_date, end_date, batch_size=1000, by_day=False):
+		try:
+			# Cursor ordenado por empresa e motorista (e dia, no backfill), lido em lotes de batch_size;
+			# por dia a ordenacao segue o indice e o start_time fica para o iter_orders_by_driver
+			sort = dict(ORDER_DRIVER_DAY_SORT if by_day else ORDER_DRIVER_SORT)
+			pipeline = [
+				{'$match': self.build_day_match(enterprise_id, start_date, end_date)},
+				{'$sort': sort},
+				{'$project': self.build_projection()},
+			]
+
+			cursor = self.get_order_collection().aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+			for raw in cursor:
+				yield OrderTiming.from_raw(raw)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def load_updated_driver_days(self, enterprise_id, since, until):
+		try:
+			# Ordens criadas, editadas ou excluidas depois da marca d'agua; lidas no primario, pois a marca
+			# avanca ate agora e uma escrita ainda nao replicada num secundario nunca seria vista
+			match = self.build_enterprise_filter({
+				'$or': [
+					{'updated_at': {'$gt': since, '$lte': until}},
+					{'created_at': {'$gt': since, '$lte': until}},
+				],
+			}, enterprise_id)
+
+			pipeline = [
+				{'$match': match},
+				{'$group': {
+					'_id': {'enterprise': '$enterprise', 'driver': '$driver', 'scheduled_at': self.build_day_expression('$scheduled_at')},
+					'orders': {'$push': '$_id'},
+				}},
+			]
+
+			driver_days = []
+			order_ids = []
+			for group in DatabaseConnector.get_primary_collection(Order).aggregate(pipeline, allowDiskUse=True):
+				key = group['_id']
+				if key.get('driver') is not None:
+					driver_days.append((key.get('enterprise'), key['driver'], key.get('scheduled_at')))
+				order_ids.extend(group['orders'])
+
+			# Ordem trocada de motorista ou de dia (ou sem motorista agora) ainda consta no motorista-dia antigo
+			known_driver_days = set(driver_days)
+			for driver_day in self.load_previous_driver_days(order_ids):
+				if driver_day not in known_driver_days:
+					known_driver_days.add(driver_day)
+					driver_days.append(driver_day)
+
+			return driver_days
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def load_previous_driver_days(self, order_ids, chunk_size=500):
+		try:
+			# Motoristas-dia ja gravados que listam as ordens; realizada e prevista trazem as mesmas ordens
+			driver_days = []
+			collection = DatabaseConnector.get_primary_collection(DriverWorkingDay)
+			for i in range(0, len(order_ids), chunk_size):
+				cursor = collection.find(
+					{'accomplished.details.id': {'$in': order_ids[i:i + chunk_size]}},
+					{'enterprise': 1, 'driver': 1, 'scheduled_at': 1}
+				)
+				driver_days.extend(
+					(working_day.get('enterprise'), working_day['driver'], working_day.get('scheduled_at'))
+					for working_day in cursor
+				)
+
+			return driver_days
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def load_driver_day_orders(self, driver_days, chunk_size=500):
+		try:
+			# Cada (empresa, motorista, dia) fica inteiro dentro de um lote de consulta
+			orders = []
+			for i in range(0, len(driver_days), chunk_size):
+				pipeline = [
+					{'$match': self.build_driver_days_match(driver_days[i:i + chunk_size])},
+					{'$sort': dict(ORDER_DRIVER_DAY_SORT)},
+					{'$project': self.build_projection()},
+				]
+				orders.extend(OrderTiming.from_raw(raw) for raw in self.get_order_collection(primary=True).aggregate(pipeline, allowDiskUse=True))
+
+			return orders
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def load_route_ids(self, enterprise_id, start_date, end_date):
+		try:
+			return DatabaseConnector.get_read_collection(Order).distinct(
+				'route',
+				self.build_day_match(enterprise_id, start_date, end_date)
+			)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def load_orders_grouped_by_driver(self, enterprise_id, start_date, end_date):
+		try:
+			# Agrupamento e ordenacao por start_time feitos no servidor, um lote por motorista
+			pipeline = [
+				{'$match': self.build_day_match(enterprise_id, start_date, end_date)},
+				{'$sort': {'driver': 1, 'start_time': 1}},
+				{'$project': self.build_projection()},
+				{'$group': {'_id': '$driver', 'orders': {'$push': '$$ROOT'}}},
+				{'$sort': {'_id': 1}},
+			]
+
+			for group in self.get_order_collection().aggregate(pipeline, allowDiskUse=True):
+				yield group['_id'], [OrderTiming.from_raw(raw) for raw in group['orders']]
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
@@ -1,6 +1,12 @@
 import sys
+from itertools import groupby
+from bson import DBRef
+from mongoengine import Document
+from src.database.DatabaseConnector import DatabaseConnector
 from src.model.driver_working_day import DriverWorkingDay
-from src.utils import DateTimeUtils
+from src.model.job_models import Route, User
+from src.model.order_timing import OrderTiming
+from src.utils import DateTimeUtils, INTRA_DAY_THRESHOLD
 
 class OrderService:
 
@@ -11,7 +17,7 @@ class OrderService:
 		try:
 			grouped_orders = {}
 			for order in orders:
-				driver_id = order.driver.id
+				driver_id = self.get_raw_reference_id(order, 'driver')
 
 				if driver_id not in grouped_orders:
 					grouped_orders[driver_id] = []
@@ -23,212 +29,263 @@ class OrderService:
 			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
 			raise e
 
-	def save_working_day(self, working_day):
+	def get_reference_id(self, value):
+		if isinstance(value, (DBRef, Document)):
+			return value.id
+		return value
+
+	def iter_orders_by_driver(self, sorted_orders, by_day=False):
+		# Espera as ordens ja ordenadas por empresa, motorista (e dia); entrega cada grupo assim que a chave muda
+		def group_key(order):
+			# Agrupa pelo dia (00:00): um scheduled_at com horario nao separa o motorista-dia
+			scheduled_at = self.date_utils.get_day_start(order['scheduled_at']) if by_day else None
+			return (
+				self.get_raw_reference_id(order, 'enterprise'),
+				self.get_raw_reference_id(order, 'driver'),
+				scheduled_at
+			)
+
+		for (enterprise_id, driver_id, scheduled_at), driver_orders in groupby(sorted_orders, key=group_key):
+			if by_day:
+				# O cursor ordena pelo scheduled_at bruto antes do start_time; dentro do dia vale o start_time
+				yield enterprise_id, driver_id, scheduled_at, sorted(driver_orders, key=lambda order: order['start_time'] or '')
+			else:
+				yield enterprise_id, driver_id, scheduled_at, list(driver_orders)
+
+	def to_order_timings(self, orders):
+		# Documentos do mongoengine viram OrderTiming; registros ja convertidos passam direto
+		return [order if isinstance(order, OrderTiming) else OrderTiming.from_document(order) for order in orders]
+
+	def get_raw_reference_id(self, order, field):
+		# Le o id gravado na referencia sem desreferenciar o documento
+		if isinstance(order, Document):
+			return self.get_reference_id(order._data.get(field))
+		return self.get_reference_id(order[field])
+
+	def load_drivers(self, driver_ids, fields=('name', 'full_name', 'enrollment')):
 		try:
-			driver_working_day = DriverWorkingDay(**working_day)
-			driver_working_day.save()
+			drivers = {}
+			driver_ids = list(set(driver_ids))
+			if not driver_ids:
+				return drivers
+
+			cursor = DatabaseConnector.get_read_collection(User).find(
+				{'_id': {'$in': driver_ids}},
+				{field: 1 for field in fields}
+			)
+			for driver in cursor:
+				drivers[driver['_id']] = driver
+
+			return drivers
 		except Exception as e:
 			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
-			raise  
+			raise e
 
-	def process_working_day_realized(self, driver_orders):
+	def resolve_routes(self, orders):
 		try:
-			work_time = 0
-			unproductive_time = 0
-			productive_time = 0
-			on_hold_time = 0
-			overtime = 0
-			intra_day = 0
-			inter_day = 0
-	
-			orders = []
-			
-			for i in range(len(driver_orders)): 
-				current_order = driver_orders[i]
-			
-				# Pegada - Inicio
-				partial_duration_unproductive_time_init = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['started_improdutive_time_at'], 
-					current_order['started_travel_at']
-				)
-				unproductive_time += partial_duration_unproductive_time_init
-
-				# Finalizada - Largada
-				partial_duration_unproductive_time_end = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['completed_at'], 
-					current_order['delivered_at']
-				)
-				unproductive_time += partial_duration_unproductive_time_end
-			
-				# Inicio - Finalizada
-				partial_duration_productive_time = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['started_travel_at'], 
-					current_order['completed_at']
-				)
-				productive_time += partial_duration_productive_time
-
-				# Pegada - Largada
-				partial_duration_work_time = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['started_improdutive_time_at'], 
-					current_order['delivered_at']
-				)
-				work_time += partial_duration_work_time
+			route_ids = set()
+			for order in orders:
+				route_ids.add(self.get_raw_reference_id(order, 'route'))
 
-				# Se este não for o último pedido
-				if i < len(driver_orders) - 1:
-					next_order = driver_orders[i + 1]
-					partial_duration = 0
-     
-					partial_duration = self.date_utils.calculate_hour_difference_from_iso_dates(
-						next_order['started_improdutive_time_at'],
-						current_order['delivered_at'], 
-					)
-		
-					if partial_duration < 60:
-						on_hold_time += partial_duration
-					else:
-						intra_day += partial_duration
-      
-					if i == len(driver_orders) - 1:
-						intra_day = 0
-						on_hold_time = 0
-      
-				orders.append({
-					"id": current_order['id'],
-					"start_at": current_order['started_improdutive_time_at'],
-					"first_point_at": current_order['started_travel_at'],
-					"last_point_at": current_order['completed_at'],
-					"end_at": current_order['delivered_at'],
-					"direction": current_order['direction'],
-					"route": {
-						"id": current_order['route']['id'],
-						"description": current_order['route']['description'],
-						"color": current_order['route']['color'],
-						"subenterprise": current_order['route']['subenterprise']['id']
-					},
-					"unproductive_time_init": self.date_utils.convert_minute_in_hours(partial_duration_unproductive_time_init),
-					"unproductive_time_end": self.date_utils.convert_minute_in_hours(partial_duration_unproductive_time_end),
-					"productive_time": self.date_utils.convert_minute_in_hours(partial_duration_productive_time),
-					"work_time": self.date_utils.convert_minute_in_hours(partial_duration_work_time),
-					"on_hold_time": self.date_utils.convert_minute_in_hours(on_hold_time),
-					"overtime": self.date_utils.convert_minute_in_hours(overtime),
-					"intra_day": self.date_utils.convert_minute_in_hours(intra_day),
-				})
-			
-			summary = {
-				"work_time": self.date_utils.convert_minute_in_hours(work_time),
-				"unproductive_time": self.date_utils.convert_minute_in_hours(unproductive_time),
-				"productive_time": self.date_utils.convert_minute_in_hours(productive_time),
-				"on_hold_time": self.date_utils.convert_minute_in_hours(on_hold_time),
-				"intra_day": self.date_utils.convert_minute_in_hours(intra_day),
-				"inter_day": self.date_utils.convert_minute_in_hours(inter_day),
-				"overtime": self.date_utils.convert_minute_in_hours(overtime),
-			}
-  
-			return {
-				"summary": summary,
-				"details": orders
+			return self.load_routes(route_ids)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
+
+	def load_routes(self, route_ids):
+		try:
+			routes = {}
+			route_ids = [self.get_reference_id(route_id) for route_id in route_ids if route_id is not None]
+			if not route_ids:
+				return routes
+
+			# A subempresa ja esta gravada na rota, entao basta uma consulta $in
+			cursor = DatabaseConnector.get_read_collection(Route).find(
+				{'_id': {'$in': route_ids}},
+				{'description': 1, 'color': 1, 'subenterprise': 1}
+			)
+			for route in cursor:
+				routes[route['_id']] = {
+					"id": route['_id'],
+					"description": route.get('description'),
+					"color": route.get('color'),
+					"subenterprise": self.get_reference_id(route.get('subenterprise'))
+				}
+
+			return routes
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
+
+	def build_working_day(self, driver_id, enterprise_id, scheduled_at, driver_orders, routes=None):
+		working_day = self.process_working_day(driver_orders, routes)
+		working_day_realized = working_day['realized']
+		working_day_foreseen = working_day['foreseen']
+
+		return {
+			"driver": driver_id,
+			"scheduled_at": scheduled_at,
+			"enterprise": enterprise_id,
+			"accomplished": {
+				"summary": working_day_realized['summary'],
+				"details": working_day_realized['details']
+			},
+			"foreseen": {
+				"summary": working_day_foreseen['summary'],
+				"details": working_day_foreseen['details']
 			}
+		}
+
+	def build_working_days(self, groups, routes=None):
+		return [
+			self.build_working_day(driver_id, enterprise_id, scheduled_at, driver_orders, routes)
+			for enterprise_id, driver_id, scheduled_at, driver_orders in groups
+		]
+
+	def save_working_day(self, working_day):
+		try:
+			driver_working_day = DriverWorkingDay(**working_day)
+			driver_working_day.save()
 		except Exception as e:
 			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
-			raise e			
+			raise  
 
-	def process_working_day_foreseen(self, driver_orders):
+	def build_summary(self, work_time, unproductive_time, productive_time, on_hold_time, intra_day, inter_day, overtime):
+		return {
+			"work_time": self.date_utils.convert_milliseconds_in_hours(work_time),
+			"unproductive_time": self.date_utils.convert_milliseconds_in_hours(unproductive_time),
+			"productive_time": self.date_utils.convert_milliseconds_in_hours(productive_time),
+			"on_hold_time": self.date_utils.convert_milliseconds_in_hours(on_hold_time),
+			"intra_day": self.date_utils.convert_milliseconds_in_hours(intra_day),
+			"inter_day": self.date_utils.convert_milliseconds_in_hours(inter_day),
+			"overtime": self.date_utils.convert_milliseconds_in_hours(overtime),
+		}
+
+	def build_detail(self, order_data, start_at, first_point_at, last_point_at, end_at, unproductive_time_init, unproductive_time_end, productive_time, work_time, on_hold_time, overtime, intra_day):
+		return {
+			"id": order_data['id'],
+			"start_at": start_at,
+			"first_point_at": first_point_at,
+			"last_point_at": last_point_at,
+			"end_at": end_at,
+			"direction": order_data['direction'],
+			"route": order_data['route'],
+			"unproductive_time_init": self.date_utils.convert_milliseconds_in_hours(unproductive_time_init),
+			"unproductive_time_end": self.date_utils.convert_milliseconds_in_hours(unproductive_time_end),
+			"productive_time": self.date_utils.convert_milliseconds_in_hours(productive_time),
+			"work_time": self.date_utils.convert_milliseconds_in_hours(work_time),
+			"on_hold_time": self.date_utils.convert_milliseconds_in_hours(on_hold_time),
+			"overtime": self.date_utils.convert_milliseconds_in_hours(overtime),
+			"intra_day": self.date_utils.convert_milliseconds_in_hours(intra_day),
+		}
+
+	def process_working_day(self, driver_orders, routes=None):
+		# Jornada realizada e prevista calculadas numa unica passagem pelas ordens
 		try:
-			work_time = 0
-			unproductive_time = 0
-			productive_time = 0
-			on_hold_time = 0
+			# Duracoes em milissegundos inteiros; "HH:MM" so na renderizacao
+			diff = self.date_utils.calculate_milliseconds_difference
+			driver_orders = self.to_order_timings(driver_orders)
+			if routes is None:
+				routes = self.resolve_routes(driver_orders)
+
+			realized_work_time = realized_unproductive_time = realized_productive_time = 0
+			realized_on_hold_time = realized_intra_day = 0
+			foreseen_work_time = foreseen_unproductive_time = foreseen_productive_time = 0
+			foreseen_on_hold_time = foreseen_intra_day = 0
 			overtime = 0
-			intra_day = 0
 			inter_day = 0
-	
-			orders = []
-			
-			for i in range(len(driver_orders)): 
+
+			realized_orders = []
+			foreseen_orders = []
+			last_index = len(driver_orders) - 1
+
+			for i in range(len(driver_orders)):
 				current_order = driver_orders[i]
-	
-				# Pegada - Inicio
-				partial_duration_unproductive_time_init = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['start_at'], 
-					current_order['waypoints'][0]['scheduled_at']
-				)
-				unproductive_time += partial_duration_unproductive_time_init
-
-				# Finalizada - Largada
-				partial_duration_unproductive_time_end = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['waypoints'][-1]['scheduled_at'], 
-					current_order['end_at']
-				)
-				unproductive_time += partial_duration_unproductive_time_end
-			
-				# Inicio - Finalizada
-				partial_duration_productive_time = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['waypoints'][0]['scheduled_at'],
-					current_order['waypoints'][-1]['scheduled_at']
-				)
-				productive_time += partial_duration_productive_time
-
-				# Pegada - Largada
-				partial_duration_work_time = self.date_utils.calculate_hour_difference_from_iso_dates(
-					current_order['start_at'],
-					current_order['end_at']
-				)
-				work_time += partial_duration_work_time
+
+				# Dados compartilhados pelas duas jornadas
+				order_data = {
+					"id": current_order.id,
+					"direction": current_order.direction,
+					"route": routes[current_order.route],
+				}
+
+				started_improdutive_time_at = current_order.started_improdutive_time_at
+				started_travel_at = current_order.started_travel_at
+				completed_at = current_order.completed_at
+				delivered_at = current_order.delivered_at
+
+				start_at = current_order.start_at
+				first_point_at = current_order.first_point_at
+				last_point_at = current_order.last_point_at
+				end_at = current_order.end_at
+
+				# Realizada: Pegada - Inicio, Finalizada - Largada, Inicio - Finalizada, Pegada - Largada
+				realized_unproductive_time_init = diff(started_improdutive_time_at, started_travel_at)
+				realized_unproductive_time += realized_unproductive_time_init
+				realized_unproductive_time_end = diff(completed_at, delivered_at)
+				realized_unproductive_time += realized_unproductive_time_end
+				realized_productive = diff(started_travel_at, completed_at)
+				realized_productive_time += realized_productive
+				realized_work = diff(started_improdutive_time_at, delivered_at)
+				realized_work_time += realized_work
+
+				# Prevista: mesmos intervalos sobre os horarios programados
+				foreseen_unproductive_time_init = diff(start_at, first_point_at)
+				foreseen_unproductive_time += foreseen_unproductive_time_init
+				foreseen_unproductive_time_end = diff(last_point_at, end_at)
+				foreseen_unproductive_time += foreseen_unproductive_time_end
+				foreseen_productive = diff(first_point_at, last_point_at)
+				foreseen_productive_time += foreseen_productive
+				foreseen_work = diff(start_at, end_at)
+				foreseen_work_time += foreseen_work
 
 				# Se este não for o último pedido
-				if i < len(driver_orders) - 1:
+				if i < last_index:
 					next_order = driver_orders[i + 1]
-					partial_duration = self.date_utils.calculate_hour_difference_from_iso_dates(
-						next_order['start_at'],
-						current_order['end_at'], 
-					)
-		
-					if partial_duration < 60:
-						on_hold_time += partial_duration
+
+					partial_duration = diff(next_order.started_improdutive_time_at, delivered_at)
+					if partial_duration < INTRA_DAY_THRESHOLD:
+						realized_on_hold_time += partial_duration
 					else:
-						intra_day += partial_duration
-      
-				if i == len(driver_orders) - 1:
-					intra_day = 0
-					on_hold_time = 0
-      
-				orders.append({
-					"id": current_order['id'],
-					"start_at": current_order['start_at'],
-					"first_point_at": current_order['waypoints'][0]['scheduled_at'],
-					"last_point_at": current_order['waypoints'][-1]['scheduled_at'],
-					"end_at": current_order['end_at'],
-					"direction": current_order['direction'],
-					"route": {
-						"id": current_order['route']['id'],
-						"description": current_order['route']['description'],
-						"color": current_order['route']['color'],
-						"subenterprise": current_order['route']['subenterprise']['id']
-					},
-					"unproductive_time_init": self.date_utils.convert_minute_in_hours(partial_duration_unproductive_time_init),
-					"unproductive_time_end": self.date_utils.convert_minute_in_hours(partial_duration_unproductive_time_end),
-					"productive_time": self.date_utils.convert_minute_in_hours(partial_duration_productive_time),
-					"work_time": self.date_utils.convert_minute_in_hours(partial_duration_work_time),
-					"on_hold_time": self.date_utils.convert_minute_in_hours(on_hold_time),
-					"overtime": self.date_utils.convert_minute_in_hours(overtime),
-					"intra_day": self.date_utils.convert_minute_in_hours(intra_day),
-				})
-			
-			summary = {
-				"work_time": self.date_utils.convert_minute_in_hours(work_time),
-				"unproductive_time": self.date_utils.convert_minute_in_hours(unproductive_time),
-				"productive_time": self.date_utils.convert_minute_in_hours(productive_time),
-				"on_hold_time": self.date_utils.convert_minute_in_hours(on_hold_time),
-				"intra_day": self.date_utils.convert_minute_in_hours(intra_day),
-				"inter_day": self.date_utils.convert_minute_in_hours(inter_day),
-				"overtime": self.date_utils.convert_minute_in_hours(overtime),
-			}
-	
+						realized_intra_day += partial_duration
+
+					partial_duration = diff(next_order.start_at, end_at)
+					if partial_duration < INTRA_DAY_THRESHOLD:
+						foreseen_on_hold_time += partial_duration
+					else:
+						foreseen_intra_day += partial_duration
+				else:
+					# A prevista zera espera e intrajornada na ultima ordem
+					foreseen_on_hold_time = 0
+					foreseen_intra_day = 0
+
+				realized_orders.append(self.build_detail(
+					order_data, started_improdutive_time_at, started_travel_at, completed_at, delivered_at,
+					realized_unproductive_time_init, realized_unproductive_time_end, realized_productive, realized_work,
+					realized_on_hold_time, overtime, realized_intra_day
+				))
+				foreseen_orders.append(self.build_detail(
+					order_data, start_at, first_point_at, last_point_at, end_at,
+					foreseen_unproductive_time_init, foreseen_unproductive_time_end, foreseen_productive, foreseen_work,
+					foreseen_on_hold_time, overtime, foreseen_intra_day
+				))
+
 			return {
-				"summary": summary,
-				"details": orders
+				"realized": {
+					"summary": self.build_summary(
+						realized_work_time, realized_unproductive_time, realized_productive_time,
+						realized_on_hold_time, realized_intra_day, inter_day, overtime
+					),
+					"details": realized_orders
+				},
+				"foreseen": {
+					"summary": self.build_summary(
+						foreseen_work_time, foreseen_unproductive_time, foreseen_productive_time,
+						foreseen_on_hold_time, foreseen_intra_day, inter_day, overtime
+					),
+					"details": foreseen_orders
+				}
 			}
 		except Exception as e:
 			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
-			raise e
\ No newline at end of file
+			raise e
@@ -0,0 +1,45 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src.services.order_service import OrderService
+from src.services.vectorized_working_day_engine import VectorizedWorkingDayEngine
+
+# Estado de cada processo do pool, preenchido uma unica vez pelo initializer
+worker_state = {}
+
+def create_working_day_engine(engine_name='python'):
+	if engine_name == 'numpy':
+		try:
+			return VectorizedWorkingDayEngine()
+		except ImportError as e:
+			print(f'{str(e)}, using the python engine...')
+	return OrderService()
+
+def init_worker(routes, engine_name):
+	worker_state['routes'] = routes
+	worker_state['engine'] = create_working_day_engine(engine_name)
+
+def build_working_days_batch(groups):
+	return worker_state['engine'].build_working_days(groups, worker_state['routes'])
+
+class ParallelWorkingDayBuilder:
+
+	def __init__(self, workers, routes, engine_name='python', max_pending_batches=None):
+		self.workers = workers
+		self.routes = routes
+		self.engine_name = engine_name
+		self.max_pending_batches = max_pending_batches or workers * 2
+
+	def build(self, batches):
+		# Os lotes de motoristas sao distribuidos entre os processos; os resultados voltam na ordem de envio
+		with ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.routes, self.engine_name)) as executor:
+			pending = deque()
+
+			for groups in batches:
+				pending.append(executor.submit(build_working_days_batch, groups))
+
+				# Limita os lotes em voo para nao materializar o cursor inteiro
+				if len(pending) >= self.max_pending_batches:
+					yield pending.popleft().result()
+
+			while pending:
+				yield pending.popleft().result()
@@ -0,0 +1,176 @@
+import sys, time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from src.model.order_timing import ORDER_TIMING_FIELDS
+from src.services.order_loader import OrderLoader
+from src.utils import DateTimeUtils
+
+# Alteracoes que mudam a jornada calculada do motorista
+WATCHED_FIELDS = set(ORDER_TIMING_FIELDS) | {'waypoints', 'deleted'}
+
+# Alteracoes que tiram a ordem do motorista-dia em que ela estava
+KEY_FIELDS = {'enterprise', 'driver', 'scheduled_at'}
+
+class RecomputeDaemon:
+
+	def __init__(self, recompute, enterprise_id=None, debounce_seconds=30, max_delay_seconds=300, poll_seconds=60, flush_interval_seconds=1, safety_lag_seconds=120):
+		self.recompute = recompute
+		self.enterprise_id = enterprise_id
+		self.debounce_seconds = debounce_seconds
+		self.max_delay_seconds = max_delay_seconds
+		self.poll_seconds = poll_seconds
+		self.flush_interval_seconds = flush_interval_seconds
+		self.safety_lag_seconds = safety_lag_seconds
+		self.next_flush = 0
+		self.order_loader = OrderLoader()
+		self.date_utils = DateTimeUtils()
+		self.pending = {}
+		self.running = False
+
+	def accepts_enterprise(self, enterprise_id):
+		if self.enterprise_id is None:
+			return True
+		if isinstance(self.enterprise_id, (list, tuple, set)):
+			return enterprise_id in {ObjectId(enterprise) for enterprise in self.enterprise_id}
+		return enterprise_id == ObjectId(self.enterprise_id)
+
+	def mark(self, driver_day, now=None):
+		now = time.monotonic() if now is None else now
+
+		# Rajadas do mesmo motorista-dia sao agrupadas: o prazo e renovado, limitado por max_delay
+		first_seen, _ = self.pending.get(driver_day, (now, now))
+		self.pending[driver_day] = (first_seen, now + self.debounce_seconds)
+
+	def pop_due(self, now=None):
+		now = time.monotonic() if now is None else now
+
+		due = [
+			driver_day for driver_day, (first_seen, deadline) in self.pending.items()
+			if now >= deadline or now - first_seen >= self.max_delay_seconds
+		]
+		for driver_day in due:
+			del self.pending[driver_day]
+
+		return due
+
+	def flush(self, now=None):
+		due = self.pop_due(now)
+		if not due:
+			return
+
+		print(f"recomputing {len(due)} driver days...")
+		try:
+			self.recompute(due)
+		except Exception as e:
+			# Um erro transitorio nao derruba o daemon: os motoristas-dia voltam para a fila
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			for driver_day in due:
+				self.mark(driver_day)
+
+	def maybe_flush(self, now=None):
+		# Com trafego constante o stream nunca fica ocioso; o flush roda num relogio monotonico
+		now = time.monotonic() if now is None else now
+		if now < self.next_flush:
+			return
+
+		self.next_flush = now + self.flush_interval_seconds
+		self.flush(now)
+
+	def mark_previous(self, order_id):
+		for driver_day in self.order_loader.load_previous_driver_days([order_id]):
+			if self.accepts_enterprise(driver_day[0]):
+				self.mark(driver_day)
+
+	def handle_change(self, change):
+		document = change.get('fullDocument')
+		if document is None:
+			return
+
+		operation_type = change.get('operationType')
+		if operation_type == 'update':
+			updated_fields = {field.split('.')[0] for field in change.get('updateDescription', {}).get('updatedFields', {})}
+			if not updated_fields & WATCHED_FIELDS:
+				return
+			if updated_fields & KEY_FIELDS:
+				self.mark_previous(change.get('documentKey', {}).get('_id'))
+		elif operation_type == 'replace':
+			self.mark_previous(change.get('documentKey', {}).get('_id'))
+
+		driver_day = (document.get('enterprise'), document.get('driver'), self.date_utils.get_day_start(document.get('scheduled_at')))
+		if driver_day[1] is None or not self.accepts_enterprise(driver_day[0]):
+			return
+
+		self.mark(driver_day)
+
+	def open_change_stream(self, pipeline):
+		# So a abertura decide o fallback: erros do laco de eventos nao podem ser confundidos com falta de suporte
+		try:
+			return self.order_loader.get_order_collection().watch(pipeline, full_document='updateLookup', max_await_time_ms=1000)
+		except (OperationFailure, NotImplementedError, TypeError) as e:
+			# Change streams exigem replica set; mongod local e mongomock (sem watch) caem no polling por updated_at
+			print(f'Change streams unavailable ({str(e)}), falling back to polling...')
+			return None
+
+	def watch_changes(self):
+		pipeline = [
+			{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}},
+			# Do documento completo so interessa a chave do motorista-dia
+			{'$project': {
+				'operationType': 1,
+				'documentKey': 1,
+				'updateDescription.updatedFields': 1,
+				'fullDocument.enterprise': 1,
+				'fullDocument.driver': 1,
+				'fullDocument.scheduled_at': 1,
+			}},
+		]
+
+		stream = self.open_change_stream(pipeline)
+		if stream is None:
+			return False
+
+		with stream:
+			print("listening to order change stream...")
+			while self.running and stream.alive:
+				change = stream.try_next()
+				if change is not None:
+					self.handle_change(change)
+
+				self.maybe_flush()
+
+		return True
+
+	def poll_changes(self):
+		print("polling order updates...")
+		since = datetime.now() - timedelta(seconds=self.safety_lag_seconds)
+
+		while self.running:
+			time.sleep(self.poll_seconds)
+
+			until = datetime.now()
+			for driver_day in self.order_loader.load_updated_driver_days(self.enterprise_id, since, until):
+				self.mark(driver_day)
+			# Janelas sobrepostas: uma escrita em andamento pode ficar visivel depois do seu updated_at
+			since = until - timedelta(seconds=self.safety_lag_seconds)
+
+			self.flush()
+
+	def run(self):
+		try:
+			self.running = True
+
+			if not self.watch_changes():
+				self.poll_changes()
+		except KeyboardInterrupt:
+			print("stopping daemon...")
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+		finally:
+			self.running = False
+			# Nao perde o que ja estava pendente ao encerrar
+			self.flush(now=float('inf'))
+
+	def stop(self):
+		self.running = False
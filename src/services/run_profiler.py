@@ -0,0 +1,106 @@
+import io, cProfile, pstats, tracemalloc
+from itertools import islice
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+class RunProfiler:
+	# Desligado por padrao: sem --profile/--trace-memory nenhum hook e registrado
+
+	def __init__(self, profile_path=None, trace_memory=False, top=25, frames=1):
+		self.profile_path = profile_path
+		self.trace_memory = trace_memory
+		self.top = top
+		self.frames = frames
+		self.profiler = None
+		self.last_snapshot = None
+		self.stage_memory = {}
+
+	@property
+	def enabled(self):
+		return bool(self.profile_path or self.trace_memory)
+
+	def start(self):
+		if self.trace_memory:
+			tracemalloc.start(self.frames)
+			self.last_snapshot = self.take_snapshot()
+
+		if self.profile_path:
+			self.profiler = cProfile.Profile()
+			self.profiler.enable()
+
+	def take_snapshot(self):
+		return tracemalloc.take_snapshot()
+
+	def format_top_sites(self, snapshot, previous=None):
+		statistics = snapshot.compare_to(previous, 'lineno') if previous else snapshot.statistics('lineno')
+
+		# Ignora as alocacoes do proprio tracemalloc e do import machinery (filtrar antes de agrupar e caro)
+		statistics = (
+			statistic for statistic in statistics
+			if statistic.traceback[0].filename != tracemalloc.__file__
+			and not statistic.traceback[0].filename.startswith('<frozen importlib')
+		)
+
+		return [
+			{
+				"site": f'{statistic.traceback[0].filename}:{statistic.traceback[0].lineno}',
+				"size_kb": round((statistic.size_diff if previous else statistic.size) / 1024, 1),
+				"count": statistic.count_diff if previous else statistic.count,
+			}
+			for statistic in islice(statistics, self.top)
+		]
+
+	def on_stage_end(self, name):
+		if not self.trace_memory or not tracemalloc.is_tracing():
+			return
+
+		current, peak = tracemalloc.get_traced_memory()
+		stage = self.stage_memory.setdefault(name, {"current_kb": 0, "peak_kb": 0, "top_sites": None})
+		stage["current_kb"] = round(current / 1024, 1)
+		stage["peak_kb"] = max(stage["peak_kb"], round(peak / 1024, 1))
+
+		# Etapas em streaming fecham a cada item: o snapshot (caro) e tirado so na primeira vez
+		if stage["top_sites"] is None:
+			snapshot = self.take_snapshot()
+			stage["top_sites"] = self.format_top_sites(snapshot, self.last_snapshot)[:5]
+			self.last_snapshot = snapshot
+
+	def get_peak_rss_kb(self):
+		if resource is None:
+			return None
+		# ru_maxrss vem em KB no Linux
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	def memory_summary(self):
+		if not self.trace_memory or not tracemalloc.is_tracing():
+			return None
+
+		current, peak = tracemalloc.get_traced_memory()
+		return {
+			"peak_rss_kb": self.get_peak_rss_kb(),
+			"traced_current_kb": round(current / 1024, 1),
+			"traced_peak_kb": round(peak / 1024, 1),
+			"stages": self.stage_memory,
+			"top_sites": self.format_top_sites(self.take_snapshot()),
+		}
+
+	def stop(self):
+		if self.profiler is not None:
+			self.profiler.disable()
+			self.profiler.dump_stats(self.profile_path)
+
+			summary = io.StringIO()
+			pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(self.top)
+			print(f"profile written to {self.profile_path}, top {self.top} by cumulative time:")
+			print(summary.getvalue())
+			self.profiler = None
+
+		if self.trace_memory and tracemalloc.is_tracing():
+			summary = self.memory_summary()
+			print(f"peak RSS {summary['peak_rss_kb']} KB, traced peak {summary['traced_peak_kb']} KB; top allocation sites:")
+			for site in summary['top_sites']:
+				print(f"  {site['size_kb']:>10} KB {site['count']:>8} blocks  {site['site']}")
+			tracemalloc.stop()
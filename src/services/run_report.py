@@ -0,0 +1,164 @@
+import sys, os, json, time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRIC_PREFIX = 'driver_working_day'
+
+# Contadores usados no calculo de vazao (por segundo de execucao)
+THROUGHPUT_COUNTERS = ('orders', 'driver_days', 'working_days_written')
+
+class RunReport:
+
+	def __init__(self, run):
+		self.run = run
+		self.status = 'running'
+		self.started_at = datetime.now()
+		self.finished_at = None
+		self.duration = None
+		self.stages = {}
+		self.counters = {}
+		self.commands = None
+		self.memory = None
+		self.active_stages = []
+		self.stage_hooks = []
+		self.perf_started = time.perf_counter()
+
+	@contextmanager
+	def stage(self, name):
+		# Tempo exclusivo: o tempo de uma etapa aninhada (ex.: fetch dentro de group) nao conta duas vezes
+		frame = [name, time.perf_counter(), 0.0]
+		self.active_stages.append(frame)
+		try:
+			yield
+		finally:
+			self.active_stages.pop()
+			elapsed = time.perf_counter() - frame[1]
+			self.stages[name] = self.stages.get(name, 0.0) + elapsed - frame[2]
+			if self.active_stages:
+				self.active_stages[-1][2] += elapsed
+
+			for hook in self.stage_hooks:
+				hook(name)
+
+	def current_stage(self):
+		return self.active_stages[-1][0] if self.active_stages else None
+
+	def track(self, name, iterable):
+		# Etapas em streaming: cronometra apenas o tempo gasto dentro de cada next()
+		iterator = iter(iterable)
+		while True:
+			with self.stage(name):
+				try:
+					item = next(iterator)
+				except StopIteration:
+					return
+			yield item
+
+	def count(self, name, value=1):
+		self.counters[name] = self.counters.get(name, 0) + value
+
+	def finish(self):
+		if self.finished_at is not None:
+			return
+
+		self.finished_at = datetime.now()
+		self.duration = time.perf_counter() - self.perf_started
+		if self.status == 'running':
+			self.status = 'failed'
+
+	def to_dict(self):
+		duration = self.duration if self.duration is not None else time.perf_counter() - self.perf_started
+
+		report = {
+			"run": self.run,
+			"status": self.status,
+			"started_at": self.started_at.isoformat(),
+			"finished_at": self.finished_at.isoformat() if self.finished_at else None,
+			"duration_seconds": round(duration, 6),
+			"stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+			"counters": dict(self.counters),
+			"throughput": {
+				f"{name}_per_second": round(self.counters[name] / duration, 3) if duration else None
+				for name in THROUGHPUT_COUNTERS if name in self.counters
+			},
+		}
+
+		if self.commands is not None:
+			report["commands"] = self.commands
+		if self.memory is not None:
+			report["memory"] = self.memory
+
+		return report
+
+	def write_json_line(self, path=None):
+		line = json.dumps(self.to_dict(), sort_keys=True, default=str)
+
+		if not path:
+			print(f"run report: {line}")
+			return
+
+		with open(path, 'a') as report_file:
+			report_file.write(line + '\n')
+
+	def build_prometheus_metrics(self):
+		report = self.to_dict()
+		labels = f'run="{self.run}"'
+
+		lines = [
+			f'# HELP {METRIC_PREFIX}_run_duration_seconds Wall time of the last run.',
+			f'# TYPE {METRIC_PREFIX}_run_duration_seconds gauge',
+			f'{METRIC_PREFIX}_run_duration_seconds{{{labels}}} {report["duration_seconds"]}',
+			f'# HELP {METRIC_PREFIX}_run_success Whether the last run finished without errors.',
+			f'# TYPE {METRIC_PREFIX}_run_success gauge',
+			f'{METRIC_PREFIX}_run_success{{{labels}}} {1 if self.status == "success" else 0}',
+			f'# HELP {METRIC_PREFIX}_run_finished_timestamp_seconds Unix time the last run finished.',
+			f'# TYPE {METRIC_PREFIX}_run_finished_timestamp_seconds gauge',
+			f'{METRIC_PREFIX}_run_finished_timestamp_seconds{{{labels}}} {(self.finished_at or datetime.now()).timestamp():.3f}',
+			f'# HELP {METRIC_PREFIX}_stage_seconds Exclusive wall time per stage of the last run.',
+			f'# TYPE {METRIC_PREFIX}_stage_seconds gauge',
+		]
+		lines.extend(
+			f'{METRIC_PREFIX}_stage_seconds{{{labels},stage="{name}"}} {seconds}'
+			for name, seconds in sorted(report['stages'].items())
+		)
+		lines.extend([
+			f'# HELP {METRIC_PREFIX}_items Items processed by the last run.',
+			f'# TYPE {METRIC_PREFIX}_items gauge',
+		])
+		lines.extend(
+			f'{METRIC_PREFIX}_items{{{labels},counter="{name}"}} {value}'
+			for name, value in sorted(report['counters'].items())
+		)
+
+		if self.commands is not None:
+			lines.extend([
+				f'# HELP {METRIC_PREFIX}_mongodb_commands MongoDB round-trips issued by the last run.',
+				f'# TYPE {METRIC_PREFIX}_mongodb_commands gauge',
+			])
+			lines.extend(
+				f'{METRIC_PREFIX}_mongodb_commands{{{labels},stage="{stage}",command="{command}"}} {count}'
+				for stage, commands in sorted(self.commands['by_stage'].items())
+				for command, count in sorted(commands.items())
+			)
+
+		return '\n'.join(lines) + '\n'
+
+	def write_prometheus_textfile(self, path):
+		# Escrita atomica: o node_exporter nunca le um arquivo pela metade
+		path = path.replace('{run}', self.run)
+		temporary_path = f'{path}.{os.getpid()}.tmp'
+
+		with open(temporary_path, 'w') as metrics_file:
+			metrics_file.write(self.build_prometheus_metrics())
+		os.replace(temporary_path, path)
+
+	def emit(self, report_path=None, prometheus_path=None):
+		try:
+			self.finish()
+			self.write_json_line(report_path)
+
+			if prometheus_path:
+				self.write_prometheus_textfile(prometheus_path)
+		except Exception as e:
+			# O relatorio nunca derruba o job
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
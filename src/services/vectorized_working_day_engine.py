@@ -0,0 +1,165 @@
+import sys
+from src.services.order_service import OrderService
+from src.utils import DateTimeUtils, INTRA_DAY_THRESHOLD
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+class VectorizedWorkingDayEngine:
+
+	def __init__(self):
+		if np is None:
+			raise ImportError('numpy is required by the vectorized working day engine')
+
+		self.order_service = OrderService()
+		self.date_utils = DateTimeUtils()
+
+	def to_datetime64(self, values):
+		return np.array(values, dtype='datetime64[us]')
+
+	def calculate_milliseconds(self, start_dates, end_dates):
+		# Mesmo resultado de calculate_milliseconds_difference: |fim - inicio| em milissegundos inteiros, zero se faltar uma data
+		delta = np.abs(end_dates - start_dates)
+		return np.where(np.isnat(delta), 0, delta.astype(np.int64) // 1000)
+
+	def segment_cumsum(self, values, segment_starts, segment_lengths):
+		# Soma acumulada por motorista; com inteiros a subtracao do deslocamento e exata
+		cumulative = np.cumsum(values)
+		offsets = cumulative[segment_starts] - values[segment_starts]
+		cumulative = cumulative - np.repeat(offsets, segment_lengths)
+		return cumulative, cumulative[segment_starts + segment_lengths - 1]
+
+	def format_milliseconds(self, milliseconds):
+		return [self.date_utils.convert_milliseconds_in_hours(value) for value in milliseconds.tolist()]
+
+	def compute_view(self, start_dates, first_point_dates, last_point_dates, end_dates, segment_starts, segment_lengths, reset_last):
+		unproductive_time_init = self.calculate_milliseconds(start_dates, first_point_dates)
+		unproductive_time_end = self.calculate_milliseconds(last_point_dates, end_dates)
+		productive_time = self.calculate_milliseconds(first_point_dates, last_point_dates)
+		work_time = self.calculate_milliseconds(start_dates, end_dates)
+
+		# Intervalo ate a proxima ordem do mesmo motorista: < 60 minutos e espera, senao intrajornada
+		last_indexes = segment_starts + segment_lengths - 1
+		has_next = np.ones(len(start_dates), dtype=bool)
+		has_next[last_indexes] = False
+
+		next_start_dates = np.roll(start_dates, -1)
+		gap = self.calculate_milliseconds(next_start_dates, end_dates)
+		on_hold_gap = np.where(has_next & (gap < INTRA_DAY_THRESHOLD), gap, 0)
+		intra_day_gap = np.where(has_next & (gap >= INTRA_DAY_THRESHOLD), gap, 0)
+
+		_, unproductive_total = self.segment_cumsum(unproductive_time_init + unproductive_time_end, segment_starts, segment_lengths)
+		_, productive_total = self.segment_cumsum(productive_time, segment_starts, segment_lengths)
+		_, work_total = self.segment_cumsum(work_time, segment_starts, segment_lengths)
+		on_hold_cumulative, on_hold_total = self.segment_cumsum(on_hold_gap, segment_starts, segment_lengths)
+		intra_day_cumulative, intra_day_total = self.segment_cumsum(intra_day_gap, segment_starts, segment_lengths)
+
+		# A jornada prevista zera espera e intrajornada na ultima ordem
+		if reset_last:
+			on_hold_cumulative[last_indexes] = 0
+			intra_day_cumulative[last_indexes] = 0
+			on_hold_total = np.zeros(len(segment_starts), dtype=np.int64)
+			intra_day_total = np.zeros(len(segment_starts), dtype=np.int64)
+
+		zeros = np.zeros(len(segment_starts), dtype=np.int64)
+
+		return {
+			"details": {
+				"unproductive_time_init": self.format_milliseconds(unproductive_time_init),
+				"unproductive_time_end": self.format_milliseconds(unproductive_time_end),
+				"productive_time": self.format_milliseconds(productive_time),
+				"work_time": self.format_milliseconds(work_time),
+				"on_hold_time": self.format_milliseconds(on_hold_cumulative),
+				"overtime": self.format_milliseconds(np.zeros(len(start_dates), dtype=np.int64)),
+				"intra_day": self.format_milliseconds(intra_day_cumulative),
+			},
+			"summary": {
+				"work_time": self.format_milliseconds(work_total),
+				"unproductive_time": self.format_milliseconds(unproductive_total),
+				"productive_time": self.format_milliseconds(productive_total),
+				"on_hold_time": self.format_milliseconds(on_hold_total),
+				"intra_day": self.format_milliseconds(intra_day_total),
+				"inter_day": self.format_milliseconds(zeros),
+				"overtime": self.format_milliseconds(zeros),
+			}
+		}
+
+	def build_view(self, view, orders, dates, segment_starts, segment_lengths, routes):
+		details_fields = list(view['details'].keys())
+		summary_fields = list(view['summary'].keys())
+		start_at, first_point_at, last_point_at, end_at = dates
+
+		results = []
+		for segment, (segment_start, segment_length) in enumerate(zip(segment_starts.tolist(), segment_lengths.tolist())):
+			details = []
+			for i in range(segment_start, segment_start + segment_length):
+				current_order = orders[i]
+				detail = {
+					"id": current_order.id,
+					"start_at": start_at[i],
+					"first_point_at": first_point_at[i],
+					"last_point_at": last_point_at[i],
+					"end_at": end_at[i],
+					"direction": current_order.direction,
+					"route": routes[current_order.route],
+				}
+				for field in details_fields:
+					detail[field] = view['details'][field][i]
+				details.append(detail)
+
+			results.append({
+				"summary": {field: view['summary'][field][segment] for field in summary_fields},
+				"details": details
+			})
+
+		return results
+
+	def build_working_days(self, groups, routes=None):
+		try:
+			groups = list(groups)
+			if not groups:
+				return []
+
+			orders = self.order_service.to_order_timings(order for _, _, _, driver_orders in groups for order in driver_orders)
+			if routes is None:
+				routes = self.order_service.resolve_routes(orders)
+			segment_lengths = np.array([len(driver_orders) for _, _, _, driver_orders in groups], dtype=np.int64)
+			segment_starts = np.concatenate(([0], np.cumsum(segment_lengths)[:-1])).astype(np.int64)
+
+			realized_dates = (
+				[order.started_improdutive_time_at for order in orders],
+				[order.started_travel_at for order in orders],
+				[order.completed_at for order in orders],
+				[order.delivered_at for order in orders],
+			)
+			foreseen_dates = (
+				[order.start_at for order in orders],
+				[order.first_point_at for order in orders],
+				[order.last_point_at for order in orders],
+				[order.end_at for order in orders],
+			)
+
+			realized = self.build_view(
+				self.compute_view(*[self.to_datetime64(values) for values in realized_dates], segment_starts, segment_lengths, False),
+				orders, realized_dates, segment_starts, segment_lengths, routes
+			)
+			foreseen = self.build_view(
+				self.compute_view(*[self.to_datetime64(values) for values in foreseen_dates], segment_starts, segment_lengths, True),
+				orders, foreseen_dates, segment_starts, segment_lengths, routes
+			)
+
+			return [
+				{
+					"driver": driver_id,
+					"scheduled_at": scheduled_at,
+					"enterprise": enterprise_id,
+					"accomplished": realized[segment],
+					"foreseen": foreseen[segment]
+				}
+				for segment, (enterprise_id, driver_id, scheduled_at, _) in enumerate(groups)
+			]
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
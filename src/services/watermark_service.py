@@ -0,0 +1,32 @@
+import sys, datetime
+from src.model.job_watermark import JobWatermark
+
+class WatermarkService:
+
+	def build_name(self, enterprise_id):
+		if enterprise_id is None:
+			return 'driver_working_days:all'
+		if isinstance(enterprise_id, (list, tuple, set)):
+			return 'driver_working_days:' + ','.join(sorted(str(enterprise) for enterprise in enterprise_id))
+		return f'driver_working_days:{enterprise_id}'
+
+	def load_watermark(self, name, lookback_hours=24):
+		try:
+			watermark = JobWatermark.objects(name=name).first()
+			if watermark is None or watermark.updated_at is None:
+				return datetime.datetime.now() - datetime.timedelta(hours=lookback_hours)
+			return watermark.updated_at
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
+
+	def save_watermark(self, name, updated_at):
+		try:
+			JobWatermark.objects(name=name).update_one(
+				set__updated_at=updated_at,
+				set__run_at=datetime.datetime.now(),
+				upsert=True
+			)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
@@ -0,0 +1,153 @@
+import sys
+from itertools import groupby
+from pymongo.errors import OperationFailure
+from src.database.DatabaseConnector import DatabaseConnector
+from src.model.job_models import Order
+from src.services.order_loader import OrderLoader
+from src.utils import DateTimeUtils, INTRA_DAY_THRESHOLD
+
+REALIZED_SUMMARY_FIELDS = ('work_time', 'unproductive_time', 'productive_time', 'on_hold_time', 'intra_day')
+
+class WorkingDaySummaryService:
+	# API de biblioteca (relatorios e benchmark): so o resumo realizado, sem detalhes nem jornada prevista,
+	# por isso nao substitui o calculo do main(). Resultados indexados por (empresa, motorista)
+
+	def __init__(self):
+		self.date_utils = DateTimeUtils()
+		self.order_loader = OrderLoader()
+
+	def build_duration(self, start, end):
+		# Mesma regra do calculate_milliseconds_difference: a subtracao de datas ja vem em milissegundos, zero se faltar uma das datas
+		return {
+			'$cond': [
+				{'$and': [start, end]},
+				{'$abs': {'$subtract': [end, start]}},
+				0
+			]
+		}
+
+	def build_realized_pipeline(self, enterprise_id, start_date, end_date):
+		gap = {
+			'$cond': [
+				'$has_next',
+				self.build_duration('$next_started_improdutive_time_at', '$delivered_at'),
+				None
+			]
+		}
+
+		return [
+			{'$match': self.order_loader.build_day_match(enterprise_id, start_date, end_date)},
+			{'$setWindowFields': {
+				'partitionBy': {'enterprise': '$enterprise', 'driver': '$driver'},
+				'sortBy': {'start_time': 1},
+				'output': {
+					'next_started_improdutive_time_at': {
+						'$shift': {'output': '$started_improdutive_time_at', 'by': 1, 'default': None}
+					},
+					'has_next': {'$shift': {'output': True, 'by': 1, 'default': False}},
+				}
+			}},
+			{'$project': {
+				'enterprise': 1,
+				'driver': 1,
+				# Pegada - Inicio + Finalizada - Largada
+				'unproductive_time': {'$add': [
+					self.build_duration('$started_improdutive_time_at', '$started_travel_at'),
+					self.build_duration('$completed_at', '$delivered_at'),
+				]},
+				# Inicio - Finalizada
+				'productive_time': self.build_duration('$started_travel_at', '$completed_at'),
+				# Pegada - Largada
+				'work_time': self.build_duration('$started_improdutive_time_at', '$delivered_at'),
+				'gap': gap,
+			}},
+			{'$project': {
+				'enterprise': 1,
+				'driver': 1,
+				'unproductive_time': 1,
+				'productive_time': 1,
+				'work_time': 1,
+				'on_hold_time': {'$cond': [{'$and': [{'$ne': ['$gap', None]}, {'$lt': ['$gap', INTRA_DAY_THRESHOLD]}]}, '$gap', 0]},
+				'intra_day': {'$cond': [{'$gte': ['$gap', INTRA_DAY_THRESHOLD]}, '$gap', 0]},
+			}},
+			{'$group': {
+				'_id': {'enterprise': '$enterprise', 'driver': '$driver'},
+				**{field: {'$sum': f'${field}'} for field in REALIZED_SUMMARY_FIELDS}
+			}},
+		]
+
+	def summarize_realized(self, enterprise_id, start_date, end_date):
+		try:
+			pipeline = self.build_realized_pipeline(enterprise_id, start_date, end_date)
+
+			try:
+				cursor = DatabaseConnector.get_read_collection(Order).aggregate(pipeline, allowDiskUse=True)
+				return {
+					(summary['_id']['enterprise'], summary['_id']['driver']): {field: int(summary[field]) for field in REALIZED_SUMMARY_FIELDS}
+					for summary in cursor
+				}
+			except (OperationFailure, NotImplementedError) as e:
+				# Servidores sem $setWindowFields (MongoDB < 5.0) e o mongomock
+				print(f'Server-side summary unavailable ({str(e)}), computing on client...')
+
+			return self.summarize_realized_on_client(enterprise_id, start_date, end_date)
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
+
+	def summarize_realized_on_client(self, enterprise_id, start_date, end_date):
+		try:
+			pipeline = [
+				{'$match': self.order_loader.build_day_match(enterprise_id, start_date, end_date)},
+				{'$sort': {'enterprise': 1, 'driver': 1, 'start_time': 1}},
+				{'$project': {
+					'enterprise': 1,
+					'driver': 1,
+					'started_improdutive_time_at': 1,
+					'started_travel_at': 1,
+					'completed_at': 1,
+					'delivered_at': 1,
+				}},
+			]
+			cursor = DatabaseConnector.get_read_collection(Order).aggregate(pipeline, allowDiskUse=True)
+
+			summaries = {}
+			# O mesmo motorista pode atuar em mais de uma empresa: cada par tem a sua jornada
+			for driver_key, driver_orders in groupby(cursor, key=lambda order: (order.get('enterprise'), order.get('driver'))):
+				summaries[driver_key] = self.summarize_driver_orders(list(driver_orders))
+
+			return summaries
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise e
+
+	def summarize_driver_orders(self, driver_orders):
+		summary = {field: 0 for field in REALIZED_SUMMARY_FIELDS}
+		diff = self.date_utils.calculate_milliseconds_difference
+
+		for i, current_order in enumerate(driver_orders):
+			summary['unproductive_time'] += diff(current_order.get('started_improdutive_time_at'), current_order.get('started_travel_at'))
+			summary['unproductive_time'] += diff(current_order.get('completed_at'), current_order.get('delivered_at'))
+			summary['productive_time'] += diff(current_order.get('started_travel_at'), current_order.get('completed_at'))
+			summary['work_time'] += diff(current_order.get('started_improdutive_time_at'), current_order.get('delivered_at'))
+
+			if i < len(driver_orders) - 1:
+				partial_duration = diff(driver_orders[i + 1].get('started_improdutive_time_at'), current_order.get('delivered_at'))
+
+				if partial_duration < INTRA_DAY_THRESHOLD:
+					summary['on_hold_time'] += partial_duration
+				else:
+					summary['intra_day'] += partial_duration
+
+		return summary
+
+	def format_summary(self, summary):
+		return {
+			"work_time": self.date_utils.convert_milliseconds_in_hours(summary['work_time']),
+			"unproductive_time": self.date_utils.convert_milliseconds_in_hours(summary['unproductive_time']),
+			"productive_time": self.date_utils.convert_milliseconds_in_hours(summary['productive_time']),
+			"on_hold_time": self.date_utils.convert_milliseconds_in_hours(summary['on_hold_time']),
+			"intra_day": self.date_utils.convert_milliseconds_in_hours(summary['intra_day']),
+			"inter_day": self.date_utils.convert_milliseconds_in_hours(0),
+			"overtime": self.date_utils.convert_milliseconds_in_hours(0),
+		}
@@ -0,0 +1,124 @@
+import sys, datetime, hashlib, json
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.database.DatabaseConnector import DatabaseConnector
+from src.model.driver_working_day import DriverWorkingDay
+
+WORKING_DAY_KEY = ('driver', 'enterprise', 'scheduled_at')
+
+# Campos obrigatorios do DriverWorkingDay; to_mongo() nao os valida
+REQUIRED_FIELDS = tuple(field.db_field for field in DriverWorkingDay._fields.values() if field.required)
+
+class DriverWorkingDayWriter:
+
+	def __init__(self, chunk_size=500):
+		self.chunk_size = chunk_size
+		self.working_days = []
+		self.written = 0
+		self.skipped = 0
+		self.failed = 0
+		self.chunks = 0
+
+	def build_key(self, document):
+		return tuple(document.get(field) for field in WORKING_DAY_KEY)
+
+	def build_content_hash(self, document):
+		content = json.dumps(
+			{'accomplished': document.get('accomplished'), 'foreseen': document.get('foreseen')},
+			sort_keys=True,
+			default=str
+		)
+		return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+	def add(self, working_day):
+		# to_mongo converte os campos sem o custo do validate() feito pelo save()
+		document = DriverWorkingDay(**working_day).to_mongo().to_dict()
+
+		missing_fields = [field for field in REQUIRED_FIELDS if document.get(field) is None]
+		if missing_fields:
+			raise Exception(f'working day {self.build_key(document)} is missing {", ".join(missing_fields)}')
+
+		document['content_hash'] = self.build_content_hash(document)
+		self.working_days.append(document)
+
+		if len(self.working_days) >= self.chunk_size:
+			self.flush()
+
+	def load_content_hashes(self, working_days):
+		cursor = DatabaseConnector.get_write_collection(DriverWorkingDay).find(
+			{'$or': [dict(zip(WORKING_DAY_KEY, self.build_key(document))) for document in working_days]},
+			{field: 1 for field in WORKING_DAY_KEY + ('content_hash',)}
+		)
+		return {self.build_key(document): document.get('content_hash') for document in cursor}
+
+	def build_operation(self, document):
+		return UpdateOne(
+			dict(zip(WORKING_DAY_KEY, self.build_key(document))),
+			{
+				'$set': {
+					'accomplished': document.get('accomplished'),
+					'foreseen': document.get('foreseen'),
+					'content_hash': document['content_hash'],
+					'updated_at': datetime.datetime.now(),
+				},
+				'$setOnInsert': {'created_at': document.get('created_at')},
+			},
+			upsert=True
+		)
+
+	def flush(self):
+		if not self.working_days:
+			return
+
+		working_days = self.working_days
+		self.working_days = []
+		self.chunks += 1
+
+		# Dias sem alteracao no conteudo calculado nao sao regravados
+		content_hashes = self.load_content_hashes(working_days)
+		operations = [
+			self.build_operation(document)
+			for document in working_days
+			if content_hashes.get(self.build_key(document)) != document['content_hash']
+		]
+		self.skipped += len(working_days) - len(operations)
+
+		if not operations:
+			return
+
+		try:
+			result = DatabaseConnector.get_write_collection(DriverWorkingDay).bulk_write(operations, ordered=False)
+			self.written += result.upserted_count + result.modified_count
+		except BulkWriteError as e:
+			errors = e.details.get('writeErrors', [])
+			self.written += e.details.get('nUpserted', 0) + e.details.get('nModified', 0)
+			self.failed += len(errors)
+
+			print(f'Error ocurred: chunk {self.chunks} wrote {len(operations) - len(errors)} of {len(operations)} working days')
+			for error in errors[:5]:
+				print(f'  index {error.get("index")}: {error.get("errmsg")}')
+
+	def delete(self, driver_days):
+		try:
+			if not driver_days:
+				return 0
+
+			result = DatabaseConnector.get_write_collection(DriverWorkingDay).delete_many(
+				{'$or': [dict(zip(WORKING_DAY_KEY, driver_day)) for driver_day in driver_days]}
+			)
+			return result.deleted_count
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
+
+	def close(self):
+		try:
+			self.flush()
+
+			if self.failed:
+				raise Exception(f'{self.failed} working days failed to be written')
+
+			return self.written
+		except Exception as e:
+			print(f'Error ocurred: {str(e)} on line {sys.exc_info()[-1].tb_lineno}')
+			raise
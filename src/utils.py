@@ -1,5 +1,5 @@
 import configparser
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class ConfigPropertiesHelper(object):
 	config = None
@@ -8,28 +8,42 @@ class ConfigPropertiesHelper(object):
 		self.config = configparser.ConfigParser()
 		self.config.read('config.properties')
 	
-	def get_property_value(self, section, property):
-		return self.config.get(section, property)
+	def get_property_value(self, section, property, default=None):
+		if default is None:
+			return self.config.get(section, property)
+		return self.config.get(section, property, fallback=default)
+
+# Renderizacao "HH:MM" pre-calculada para duracoes de ate 48 horas
+HOURS_TABLE_LIMIT = 48 * 60
+HOURS_TABLE = tuple(f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in range(HOURS_TABLE_LIMIT + 1))
+
+# Intervalo entre ordens a partir do qual conta como intrajornada (60 minutos, em milissegundos)
+INTRA_DAY_THRESHOLD = 3600000
+MILLISECOND = timedelta(milliseconds=1)
 
 class DateTimeUtils:
     
     def __init__(self):
         pass
     
-    def calculate_hour_difference_from_iso_dates(self, start_date_iso, end_date_iso):
+    def calculate_milliseconds_difference(self, start_date_iso, end_date_iso):
+        # Milissegundos inteiros, a mesma precisao gravada pelo MongoDB; somas nao perdem fracoes de segundo
         if start_date_iso is None or end_date_iso is None:
             return 0
         
-        time_difference = abs(end_date_iso - start_date_iso)
-        duration_in_seconds = time_difference.total_seconds()
-        duration_in_minutes = duration_in_seconds / 60
-        return duration_in_minutes
+        return abs(end_date_iso - start_date_iso) // MILLISECOND
     
-    def convert_minute_in_hours(self, minutes):
-        hours = minutes // 60
-        minutes_remaining = minutes % 60
-        return f"{int(hours):02d}:{int(minutes_remaining):02d}"
+    def get_day_start(self, date):
+        # Dia do motorista-dia: a mesma data a 00:00, mesmo se o scheduled_at vier com horario
+        if date is None:
+            return None
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
     
+    def convert_milliseconds_in_hours(self, milliseconds):
+        minutes = milliseconds // 60000
+        if minutes <= HOURS_TABLE_LIMIT:
+            return HOURS_TABLE[minutes]
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
     
     def calculate_hour_difference(self, hour_start_str, hour_end_str):
         
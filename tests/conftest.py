@@ -0,0 +1,4 @@
+import os, sys
+
+# Testes executados com `python -m pytest` ou `pytest` a partir da raiz do repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+import pytest
+from src.database import IndexManager as index_manager_module
+from src.database.IndexManager import IndexManager, ORDER_INDEXES, ORDER_DRIVER_SORT, ORDER_DRIVER_DAY_SORT
+
+# Campos sempre filtrados por igualdade no build_day_match; nao interrompem o prefixo de ordenacao
+EQUALITY_FIELDS = {'deleted'}
+
+def serves_sort(index, sort):
+	keys = [key for key in index.document['key'] if key not in EQUALITY_FIELDS]
+	return keys[:len(sort)] == [field for field, _ in sort]
+
+@pytest.mark.parametrize('sort', [ORDER_DRIVER_SORT, ORDER_DRIVER_DAY_SORT])
+def test_each_order_sort_has_a_matching_index(sort):
+	assert any(serves_sort(index, sort) for index in ORDER_INDEXES)
+
+class FakeCursor:
+
+	def __init__(self, plan):
+		self.plan = plan
+		self.sorted_by = None
+
+	def sort(self, sort):
+		self.sorted_by = sort
+		return self
+
+	def explain(self):
+		return {'queryPlanner': {'winningPlan': self.plan}}
+
+class FakeCollection:
+
+	def __init__(self, cursor):
+		self.cursor = cursor
+
+	def find(self, match):
+		return self.cursor
+
+def patch_plan(monkeypatch, plan):
+	cursor = FakeCursor(plan)
+	monkeypatch.setattr(index_manager_module.Order, '_get_collection', classmethod(lambda cls: FakeCollection(cursor)))
+	return cursor
+
+def test_verify_query_plan_fails_on_a_blocking_sort(monkeypatch):
+	cursor = patch_plan(monkeypatch, {'stage': 'SORT', 'inputStage': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}})
+
+	with pytest.raises(Exception, match='SORT'):
+		IndexManager().verify_query_plan({}, 'fail', ORDER_DRIVER_DAY_SORT)
+	assert cursor.sorted_by == ORDER_DRIVER_DAY_SORT
+
+def test_verify_query_plan_accepts_an_index_ordered_scan(monkeypatch):
+	patch_plan(monkeypatch, {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}})
+
+	assert IndexManager().verify_query_plan({}, 'fail') == ['FETCH', 'IXSCAN']
@@ -0,0 +1,23 @@
+from datetime import datetime
+from bson import ObjectId
+from src.services.order_service import OrderService
+
+def build_order(driver_id, scheduled_at, start_time):
+	return {'enterprise': ObjectId('5e837a4a30fc256f5c3ad716'), 'driver': driver_id, 'scheduled_at': scheduled_at, 'start_time': start_time}
+
+def test_iter_orders_by_day_groups_on_the_date_at_midnight():
+	driver_id = ObjectId()
+	# Ordenadas como no cursor do backfill: scheduled_at bruto antes do start_time
+	orders = [
+		build_order(driver_id, datetime(2024, 4, 7), '09:00'),
+		build_order(driver_id, datetime(2024, 4, 7, 3), '06:00'),
+		build_order(driver_id, datetime(2024, 4, 7, 15, 30), '07:30'),
+		build_order(driver_id, datetime(2024, 4, 8, 1), '05:00'),
+	]
+
+	groups = list(OrderService().iter_orders_by_driver(orders, by_day=True))
+
+	assert [(scheduled_at, [order['start_time'] for order in driver_orders]) for _, _, scheduled_at, driver_orders in groups] == [
+		(datetime(2024, 4, 7), ['06:00', '07:30', '09:00']),
+		(datetime(2024, 4, 8), ['05:00']),
+	]
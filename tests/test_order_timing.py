@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+from src.database.DatabaseConnector import DatabaseConnector
+from src.model.order_timing import OrderTiming
+from src.services.order_loader import OrderLoader
+
+def build_projected_order(waypoints_count=3):
+	# Documento no formato do OrderLoader.build_projection; referencias gravadas como ObjectId
+	start_at = datetime(2024, 4, 7, 6, 0, 0, 123000)
+	return {
+		'_id': ObjectId(),
+		'enterprise': ObjectId(),
+		'driver': ObjectId(),
+		'route': ObjectId(),
+		'direction': 'incoming',
+		'scheduled_at': datetime(2024, 4, 7),
+		'start_time': '06:00',
+		'start_at': start_at,
+		'end_at': start_at + timedelta(hours=1),
+		'started_improdutive_time_at': start_at,
+		'started_travel_at': start_at + timedelta(minutes=10),
+		'completed_at': None,
+		'first_point_scheduled_at': start_at + timedelta(minutes=15),
+		'last_point_scheduled_at': start_at + timedelta(minutes=45),
+		'waypoints_count': waypoints_count,
+	}
+
+def test_from_raw_reads_raw_bson_documents_like_dicts():
+	order = build_projected_order()
+	raw_order = RawBSONDocument(bson.encode(order))
+
+	timing = OrderTiming.from_raw(raw_order)
+
+	assert timing == OrderTiming.from_raw(order)
+	assert isinstance(timing.driver, ObjectId) and timing.driver == order['driver']
+	assert isinstance(timing.route, ObjectId) and timing.enterprise == order['enterprise']
+	assert timing.first_point_at == order['first_point_scheduled_at']
+	assert timing.delivered_at is None
+
+def test_from_raw_ignores_waypoint_dates_without_waypoints():
+	timing = OrderTiming.from_raw(RawBSONDocument(bson.encode(build_projected_order(waypoints_count=0))))
+
+	assert timing.has_waypoints is False
+	assert timing.first_point_at is None and timing.last_point_at is None
+
+def test_order_collection_decodes_batches_as_raw_bson(monkeypatch):
+	# MongoClient sem conexao: so as codec options da collection sao verificadas
+	collection = MongoClient(connect=False)['driver_working_day_test']['order']
+	monkeypatch.setattr(DatabaseConnector, 'get_read_collection', classmethod(lambda cls, document: collection))
+
+	assert OrderLoader().get_order_collection().codec_options.document_class is RawBSONDocument
+	assert OrderLoader(raw_bson=False).get_order_collection().codec_options.document_class is not RawBSONDocument
@@ -0,0 +1,130 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from src.model.order_timing import OrderTiming
+from src.services.order_service import OrderService
+from src.utils import DateTimeUtils, INTRA_DAY_THRESHOLD
+
+DAY = datetime(2024, 4, 7)
+TIMESTAMP_FIELDS = ('started_improdutive_time_at', 'started_travel_at', 'completed_at', 'delivered_at')
+
+date_utils = DateTimeUtils()
+diff = date_utils.calculate_milliseconds_difference
+render = date_utils.convert_milliseconds_in_hours
+
+def reference_view(driver_orders, routes, dates, reset_last):
+	# Regras dos antigos process_working_day_realized/foreseen, uma ordem por vez.
+	# dates(order) -> (inicio, primeiro ponto, ultimo ponto, fim); fim da ordem -> inicio da seguinte e espera (< 1 h) ou intrajornada;
+	# apenas a prevista zera espera e intrajornada na ultima ordem
+	work_time = unproductive_time = productive_time = on_hold_time = intra_day = 0
+	details = []
+
+	for i, current_order in enumerate(driver_orders):
+		start_at, first_point_at, last_point_at, end_at = dates(current_order)
+
+		unproductive_time_init = diff(start_at, first_point_at)
+		unproductive_time_end = diff(last_point_at, end_at)
+		productive = diff(first_point_at, last_point_at)
+		work = diff(start_at, end_at)
+		unproductive_time += unproductive_time_init + unproductive_time_end
+		productive_time += productive
+		work_time += work
+
+		if i < len(driver_orders) - 1:
+			partial_duration = diff(dates(driver_orders[i + 1])[0], end_at)
+			if partial_duration < INTRA_DAY_THRESHOLD:
+				on_hold_time += partial_duration
+			else:
+				intra_day += partial_duration
+		elif reset_last:
+			on_hold_time = intra_day = 0
+
+		details.append({
+			"id": current_order['id'],
+			"start_at": start_at,
+			"first_point_at": first_point_at,
+			"last_point_at": last_point_at,
+			"end_at": end_at,
+			"direction": current_order['direction'],
+			"route": routes[current_order['route']],
+			"unproductive_time_init": render(unproductive_time_init),
+			"unproductive_time_end": render(unproductive_time_end),
+			"productive_time": render(productive),
+			"work_time": render(work),
+			"on_hold_time": render(on_hold_time),
+			"overtime": render(0),
+			"intra_day": render(intra_day),
+		})
+
+	return {
+		"summary": {
+			"work_time": render(work_time),
+			"unproductive_time": render(unproductive_time),
+			"productive_time": render(productive_time),
+			"on_hold_time": render(on_hold_time),
+			"intra_day": render(intra_day),
+			"inter_day": render(0),
+			"overtime": render(0),
+		},
+		"details": details,
+	}
+
+def realized_dates(order):
+	return order['started_improdutive_time_at'], order['started_travel_at'], order['completed_at'], order['delivered_at']
+
+def foreseen_dates(order):
+	return order['start_at'], order['waypoints'][0]['scheduled_at'], order['waypoints'][-1]['scheduled_at'], order['end_at']
+
+def build_driver_orders(rnd, routes):
+	def minutes(low, high):
+		return timedelta(minutes=rnd.randint(low, high), seconds=rnd.randint(0, 59), milliseconds=rnd.randint(0, 999))
+
+	driver_id = ObjectId()
+	start_at = DAY + timedelta(hours=4) + minutes(0, 120)
+	driver_orders = []
+
+	for _ in range(rnd.choice((1, 2, 3, 6, 12))):
+		first_point_at = start_at + minutes(5, 20)
+		last_point_at = first_point_at + minutes(20, 90)
+		end_at = last_point_at + minutes(5, 15)
+		raw = {
+			'_id': ObjectId(),
+			'enterprise': ObjectId(),
+			'driver': driver_id,
+			'route': rnd.choice(list(routes)),
+			'direction': rnd.choice(('incoming', 'outcoming')),
+			'scheduled_at': DAY,
+			'start_time': start_at.strftime('%H:%M'),
+			'start_at': start_at,
+			'end_at': end_at,
+			'started_improdutive_time_at': start_at + minutes(0, 5),
+			'started_travel_at': first_point_at + minutes(0, 10),
+			'completed_at': last_point_at + minutes(0, 15),
+			'delivered_at': end_at + minutes(0, 10),
+			'first_point_scheduled_at': first_point_at,
+			'last_point_scheduled_at': last_point_at,
+			'waypoints_count': rnd.randint(1, 6),
+		}
+		for field in TIMESTAMP_FIELDS:
+			if rnd.random() < 0.1:
+				raw[field] = None
+
+		driver_orders.append(OrderTiming.from_raw(raw))
+		start_at = end_at + (minutes(60, 180) if rnd.random() < 0.2 else minutes(2, 40))
+
+	return driver_orders
+
+@pytest.mark.parametrize('seed', range(20))
+def test_process_working_day_matches_the_original_rules(seed):
+	rnd = random.Random(seed)
+	routes = {route_id: {"id": route_id, "description": 'Rota', "color": '#000000', "subenterprise": None} for route_id in (ObjectId() for _ in range(3))}
+	order_service = OrderService()
+
+	for _ in range(40):
+		driver_orders = build_driver_orders(rnd, routes)
+
+		working_day = order_service.process_working_day(driver_orders, routes)
+
+		assert working_day['realized'] == reference_view(driver_orders, routes, realized_dates, reset_last=False)
+		assert working_day['foreseen'] == reference_view(driver_orders, routes, foreseen_dates, reset_last=True)
@@ -0,0 +1,80 @@
+import functools
+from types import SimpleNamespace
+import pytest
+import mongoengine
+import mongomock
+import main as job
+from benchmarks.dataset_generator import SyntheticDatasetGenerator, BENCHMARK_DB_NAME, BENCHMARK_ENTERPRISE_ID
+from src.database.CommandCounter import command_counter
+from src.database.DatabaseConnector import DatabaseConnector
+
+# Colecoes de referencia: consultas constantes, independente do numero de motoristas e ordens
+REFERENCE_COLLECTIONS = ('routes', 'users', 'subenterprises', 'enterprises')
+MAX_REFERENCE_COMMANDS = 2
+
+# Metodos do mongomock e o comando que o driver enviaria ao servidor
+MONGOMOCK_COMMANDS = {
+	'find': 'find',
+	'find_one': 'find',
+	'aggregate': 'aggregate',
+	'distinct': 'distinct',
+	'count_documents': 'aggregate',
+	'insert_one': 'insert',
+	'insert_many': 'insert',
+	'update_one': 'update',
+	'update_many': 'update',
+	'bulk_write': 'update',
+	'delete_one': 'delete',
+	'delete_many': 'delete',
+}
+
+class CountingDatabaseConnector(DatabaseConnector):
+	# A conexao mongomock e aberta pela fixture
+
+	def connect_database(self):
+		pass
+
+@pytest.fixture
+def counting_mongomock(monkeypatch):
+	# mongomock nao publica eventos de monitoramento: cada chamada externa vira um started() no command_counter
+	depth = [0]
+
+	def counting(method, command_name):
+		@functools.wraps(method)
+		def wrapper(self, *args, **kwargs):
+			if depth[0] == 0:
+				command_counter.started(SimpleNamespace(command_name=command_name, command={command_name: self.name}))
+			depth[0] += 1
+			try:
+				return method(self, *args, **kwargs)
+			finally:
+				depth[0] -= 1
+		return wrapper
+
+	for method_name, command_name in MONGOMOCK_COMMANDS.items():
+		monkeypatch.setattr(
+			mongomock.collection.Collection, method_name,
+			counting(getattr(mongomock.collection.Collection, method_name), command_name)
+		)
+	monkeypatch.setattr(job, 'db_connector', CountingDatabaseConnector())
+
+	yield
+
+	mongoengine.disconnect_all()
+
+def run_main(drivers, orders_per_driver):
+	mongoengine.disconnect_all()
+	mongoengine.connect(BENCHMARK_DB_NAME, mongo_client_class=mongomock.MongoClient)
+	SyntheticDatasetGenerator(seed=drivers).generate(drivers, orders_per_driver)
+
+	job.main('2024-04-07', enterprise_id=BENCHMARK_ENTERPRISE_ID)
+	return dict(command_counter.counts)
+
+def test_main_issues_the_same_commands_per_stage_at_any_scale(counting_mongomock):
+	small = run_main(5, 4)
+	large = run_main(60, 8)
+
+	# Dentro de um lote de gravacao (job.write_chunk_size), o numero de comandos nao cresce com os dados
+	assert large == small
+	for collection in REFERENCE_COLLECTIONS:
+		assert sum(count for (_, _, count_collection), count in large.items() if count_collection == collection) <= MAX_REFERENCE_COMMANDS
@@ -0,0 +1,55 @@
+import pytest
+from bson import ObjectId
+from src.services.recompute_daemon import RecomputeDaemon
+
+class FakeChangeStream:
+
+	def __init__(self, changes):
+		self.changes = list(changes)
+		self.alive = True
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.alive = False
+
+	def try_next(self):
+		return self.changes.pop(0) if self.changes else None
+
+class FakeCollection:
+
+	def __init__(self, stream=None, error=None):
+		self.stream = stream
+		self.error = error
+
+	def watch(self, *args, **kwargs):
+		if self.error:
+			raise self.error
+		return self.stream
+
+def build_daemon(monkeypatch, collection):
+	daemon = RecomputeDaemon(lambda driver_days: None, debounce_seconds=0)
+	monkeypatch.setattr(daemon.order_loader, 'get_order_collection', lambda primary=False: collection)
+	polled = []
+	monkeypatch.setattr(daemon, 'poll_changes', lambda: polled.append(True))
+	return daemon, polled
+
+def test_run_falls_back_to_polling_when_watch_is_unavailable(monkeypatch):
+	daemon, polled = build_daemon(monkeypatch, FakeCollection(error=TypeError('no watch')))
+
+	daemon.run()
+
+	assert polled == [True]
+
+def test_run_propagates_errors_raised_while_handling_changes(monkeypatch):
+	change = {'operationType': 'insert', 'fullDocument': {'enterprise': ObjectId(), 'driver': ObjectId(), 'scheduled_at': None}}
+	daemon, polled = build_daemon(monkeypatch, FakeCollection(stream=FakeChangeStream([change])))
+
+	def broken_mark(driver_day, now=None):
+		raise TypeError('bug in the event loop')
+	monkeypatch.setattr(daemon, 'mark', broken_mark)
+
+	with pytest.raises(TypeError, match='event loop'):
+		daemon.run()
+	assert polled == []
@@ -0,0 +1,154 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from src.model.order_timing import OrderTiming
+from src.services.order_service import OrderService
+from src.services.vectorized_working_day_engine import VectorizedWorkingDayEngine, np
+
+pytestmark = pytest.mark.skipif(np is None, reason='numpy not installed')
+
+DAY = datetime(2024, 4, 7)
+ENTERPRISE_ID = ObjectId('5e837a4a30fc256f5c3ad716')
+TIMESTAMP_FIELDS = ('started_improdutive_time_at', 'started_travel_at', 'completed_at', 'delivered_at')
+
+def build_routes(count=3):
+	return {
+		route_id: {"id": route_id, "description": f'Rota {i}', "color": '#000000', "subenterprise": None}
+		for i, route_id in enumerate(ObjectId() for _ in range(count))
+	}
+
+def build_order(driver_id, route_id, start_at, durations, waypoints=True, missing=()):
+	# durations: (inicio -> primeiro ponto, primeiro -> ultimo ponto, ultimo ponto -> fim), em timedelta
+	first_point_at = start_at + durations[0]
+	last_point_at = first_point_at + durations[1]
+	end_at = last_point_at + durations[2]
+
+	raw = {
+		'_id': ObjectId(),
+		'enterprise': ENTERPRISE_ID,
+		'driver': driver_id,
+		'route': route_id,
+		'direction': 'incoming',
+		'scheduled_at': DAY,
+		'start_time': start_at.strftime('%H:%M'),
+		'start_at': start_at,
+		'end_at': end_at,
+		'started_improdutive_time_at': start_at,
+		'started_travel_at': first_point_at,
+		'completed_at': last_point_at,
+		'delivered_at': end_at,
+		'first_point_scheduled_at': first_point_at,
+		'last_point_scheduled_at': last_point_at,
+		'waypoints_count': 2 if waypoints else 0,
+	}
+	for field in missing:
+		raw[field] = None
+
+	return OrderTiming.from_raw(raw), end_at
+
+def build_groups(drivers, orders_per_driver, routes, seed):
+	rnd = random.Random(seed)
+
+	def minutes(low, high):
+		return timedelta(minutes=rnd.randint(low, high), seconds=rnd.randint(0, 59), milliseconds=rnd.randint(0, 999))
+
+	groups = []
+	for _ in range(drivers):
+		driver_id = ObjectId()
+		start_at = DAY + timedelta(hours=4) + minutes(0, 120)
+		driver_orders = []
+
+		for _ in range(rnd.choice(orders_per_driver)):
+			missing = [field for field in TIMESTAMP_FIELDS if rnd.random() < 0.1]
+			order, end_at = build_order(
+				driver_id, rnd.choice(list(routes)), start_at, (minutes(5, 20), minutes(20, 90), minutes(5, 15)),
+				waypoints=rnd.random() > 0.1, missing=missing
+			)
+			driver_orders.append(order)
+			start_at = end_at + (minutes(60, 180) if rnd.random() < 0.2 else minutes(2, 40))
+
+		groups.append((ENTERPRISE_ID, driver_id, DAY, driver_orders))
+
+	return groups
+
+def assert_engines_agree(groups, routes):
+	expected = OrderService().build_working_days(groups, routes)
+	assert VectorizedWorkingDayEngine().build_working_days(groups, routes) == expected
+	return expected
+
+@pytest.mark.parametrize('seed', range(10))
+def test_engines_agree_on_random_drivers(seed):
+	routes = build_routes()
+	assert_engines_agree(build_groups(25, (1, 2, 5, 12), routes, seed), routes)
+
+def test_engines_agree_on_single_order_drivers():
+	routes = build_routes()
+	working_days = assert_engines_agree(build_groups(10, (1,), routes, seed=1), routes)
+
+	for working_day in working_days:
+		assert working_day['accomplished']['summary']['on_hold_time'] == '00:00'
+		assert working_day['accomplished']['summary']['intra_day'] == '00:00'
+
+def test_engines_agree_on_missing_timestamps():
+	routes = build_routes(1)
+	route_id = next(iter(routes))
+	driver_id = ObjectId()
+	durations = (timedelta(minutes=10), timedelta(minutes=40), timedelta(minutes=5))
+
+	first, end_at = build_order(driver_id, route_id, DAY + timedelta(hours=6), durations, missing=TIMESTAMP_FIELDS)
+	second, end_at = build_order(driver_id, route_id, end_at + timedelta(minutes=20), durations, missing=('delivered_at',))
+	third, _ = build_order(driver_id, route_id, end_at + timedelta(minutes=20), durations, missing=('started_improdutive_time_at',))
+
+	working_day, = assert_engines_agree([(ENTERPRISE_ID, driver_id, DAY, [first, second, third])], routes)
+	assert working_day['accomplished']['details'][0]['work_time'] == '00:00'
+
+def test_engines_agree_on_empty_waypoints():
+	routes = build_routes(1)
+	route_id = next(iter(routes))
+	driver_id = ObjectId()
+	durations = (timedelta(minutes=10), timedelta(minutes=40), timedelta(minutes=5))
+
+	first, end_at = build_order(driver_id, route_id, DAY + timedelta(hours=6), durations, waypoints=False)
+	second, _ = build_order(driver_id, route_id, end_at + timedelta(minutes=20), durations, waypoints=False)
+
+	working_day, = assert_engines_agree([(ENTERPRISE_ID, driver_id, DAY, [first, second])], routes)
+	assert working_day['foreseen']['details'][0]['first_point_at'] is None
+	assert working_day['foreseen']['details'][0]['productive_time'] == '00:00'
+
+@pytest.mark.parametrize('gap, on_hold_time, intra_day', [
+	(timedelta(seconds=3600), '00:00', '01:00'),
+	(timedelta(seconds=3599, milliseconds=999), '00:59', '00:00'),
+	(timedelta(seconds=3600, milliseconds=1), '00:00', '01:00'),
+])
+def test_engines_agree_on_intra_day_boundary(gap, on_hold_time, intra_day):
+	routes = build_routes(1)
+	route_id = next(iter(routes))
+	driver_id = ObjectId()
+	durations = (timedelta(minutes=10), timedelta(minutes=40), timedelta(minutes=5))
+
+	first, end_at = build_order(driver_id, route_id, DAY + timedelta(hours=6), durations)
+	second, _ = build_order(driver_id, route_id, end_at + gap, durations)
+
+	working_day, = assert_engines_agree([(ENTERPRISE_ID, driver_id, DAY, [first, second])], routes)
+	assert working_day['accomplished']['summary']['on_hold_time'] == on_hold_time
+	assert working_day['accomplished']['summary']['intra_day'] == intra_day
+
+def test_engines_accumulate_milliseconds_before_rendering():
+	# 29:59.500 + 30:00.500 fecham uma hora; somando segundos truncados o resumo ficaria em 00:59
+	routes = build_routes(1)
+	route_id = next(iter(routes))
+	driver_id = ObjectId()
+
+	first, end_at = build_order(
+		driver_id, route_id, DAY + timedelta(hours=6),
+		(timedelta(minutes=5), timedelta(minutes=29, seconds=59, milliseconds=500), timedelta(minutes=5))
+	)
+	second, _ = build_order(
+		driver_id, route_id, end_at + timedelta(minutes=10),
+		(timedelta(minutes=5), timedelta(minutes=30, milliseconds=500), timedelta(minutes=5))
+	)
+
+	working_day, = assert_engines_agree([(ENTERPRISE_ID, driver_id, DAY, [first, second])], routes)
+	assert working_day['accomplished']['summary']['productive_time'] == '01:00'
+	assert working_day['foreseen']['summary']['productive_time'] == '01:00'
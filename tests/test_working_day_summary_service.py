@@ -0,0 +1,39 @@
+from datetime import datetime
+import mongoengine
+import mongomock
+import pytest
+from bson import ObjectId
+from benchmarks.dataset_generator import SyntheticDatasetGenerator, BENCHMARK_DB_NAME
+from src.services.order_loader import OrderLoader
+from src.services.order_service import OrderService
+from src.services.working_day_summary_service import WorkingDaySummaryService
+
+@pytest.fixture
+def orders_in_two_enterprises():
+	mongoengine.disconnect_all()
+	db = mongoengine.connect(BENCHMARK_DB_NAME, mongo_client_class=mongomock.MongoClient)[BENCHMARK_DB_NAME]
+	SyntheticDatasetGenerator(seed=7).generate(8, 6)
+
+	# Os mesmos motoristas trabalhando tambem para uma segunda empresa
+	other_enterprise_id = ObjectId()
+	db.order.insert_many([dict(order, _id=ObjectId(), enterprise=other_enterprise_id) for order in db.order.find()])
+
+	yield
+
+	mongoengine.disconnect_all()
+
+def test_summary_is_partitioned_by_enterprise_and_driver(orders_in_two_enterprises):
+	start_date, end_date = datetime(2024, 4, 7), datetime(2024, 4, 7, 23, 59)
+	order_service = OrderService()
+	summary_service = WorkingDaySummaryService()
+
+	groups = list(order_service.iter_orders_by_driver(OrderLoader().stream_orders_by_driver(None, start_date, end_date)))
+	expected = {
+		(enterprise_id, driver_id): order_service.build_working_day(driver_id, enterprise_id, None, driver_orders)['accomplished']['summary']
+		for enterprise_id, driver_id, _, driver_orders in groups
+	}
+
+	summaries = summary_service.summarize_realized(None, start_date, end_date)
+
+	assert len({enterprise_id for enterprise_id, _ in summaries}) == 2
+	assert {key: summary_service.format_summary(summary) for key, summary in summaries.items()} == expected
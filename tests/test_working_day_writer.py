@@ -0,0 +1,65 @@
+from datetime import datetime
+import mongoengine
+import mongomock
+import pytest
+from bson import ObjectId
+from src.model.driver_working_day import DriverWorkingDay
+from src.services.working_day_writer import DriverWorkingDayWriter
+
+def build_working_day(driver_id):
+	summary = {"work_time": '00:00'}
+	return {
+		"driver": driver_id,
+		"enterprise": ObjectId(),
+		"scheduled_at": datetime(2024, 4, 7),
+		"accomplished": {"summary": summary, "details": []},
+		"foreseen": {"summary": summary, "details": []},
+	}
+
+def test_add_rejects_working_day_without_driver():
+	writer = DriverWorkingDayWriter()
+
+	with pytest.raises(Exception, match='missing driver'):
+		writer.add(build_working_day(None))
+	assert writer.working_days == []
+
+def test_add_buffers_working_day_with_content_hash():
+	writer = DriverWorkingDayWriter()
+	writer.add(build_working_day(ObjectId()))
+
+	document, = writer.working_days
+	assert document['content_hash']
+
+@pytest.fixture
+def mongomock_connection():
+	mongoengine.disconnect_all()
+	mongoengine.connect('driver_working_day_test', mongo_client_class=mongomock.MongoClient)
+	yield DriverWorkingDay._get_collection()
+	mongoengine.disconnect_all()
+
+def write(working_day):
+	writer = DriverWorkingDayWriter()
+	writer.add(working_day)
+	writer.close()
+	return writer
+
+def test_flush_upserts_skips_unchanged_and_rewrites_changed_days(mongomock_connection):
+	working_day = build_working_day(ObjectId())
+
+	first = write(working_day)
+	assert (first.written, first.skipped) == (1, 0)
+
+	# Mesmo (driver, enterprise, scheduled_at) com o mesmo conteudo: nada e regravado
+	unchanged = write(dict(working_day))
+	assert (unchanged.written, unchanged.skipped) == (0, 1)
+	assert mongomock_connection.count_documents({}) == 1
+
+	changed_working_day = dict(working_day, accomplished={"summary": {"work_time": '01:30'}, "details": []})
+	changed = write(changed_working_day)
+	assert (changed.written, changed.skipped) == (1, 0)
+
+	document, = mongomock_connection.find()
+	assert document['accomplished']['summary']['work_time'] == '01:30'
+	assert (document['driver'], document['enterprise'], document['scheduled_at']) == (
+		working_day['driver'], working_day['enterprise'], working_day['scheduled_at']
+	)